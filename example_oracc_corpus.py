@@ -1,5 +1,4 @@
 import oracc_corpus
-from collections import Counter
 
 saa10_path = "saao/saa10"
 c = oracc_corpus.guess_filenames(saa10_path)
@@ -9,7 +8,7 @@ c.load_corpus()
 
 lim = 5
 print(f"\n{lim} most common normalized words in the corpus:")
-most_common_words = Counter(c.bow_norm()).most_common(lim)
+most_common_words = c.frequencies().most_common(lim)
 for [word, freq] in most_common_words:
     print(f"{word}\t{freq}")
 
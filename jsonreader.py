@@ -16,6 +16,10 @@ This module is dependent upon the structure CLTK unzips ORACC files,
 see ORACC_Importer for more information.
 """
 
+import time
+
+import oracc_profile
+
 __author__ = ['Andrew Deloucas <ADeloucas@g.harvard.com>']
 __license__ = 'MIT License. See LICENSE.'
 
@@ -55,109 +59,86 @@ class Reader(object):
                 except KeyError:
                     pass
 
-    def __transliteration__(self):
+    def __ingest_sentences__(self):  # pylint: disable=too-many-branches
         """
         Looks at either sentence or line-by-line structure and outputs
-        transliteration.
-        :return: transliteration found in each text's textdata.
+        transliteration and normalization together, in a single pass. The
+        pieces of every line are collected in a buffer and joined once.
+        :return: transliteration and normalization found in each text's textdata.
         """
         self.__parse_sentence__()
-        self.text = []  # pylint: disable=attribute-defined-outside-init
-        for k, values in self.sentences.items():  # pylint: disable=redefined-outer-name
-            self.text.append(k)
-            line = []
+        transliteration = []
+        normalization = []
+        for label, values in self.sentences.items():
+            transliteration.append(label)
+            normalization.append(label)
+            translit_line = []
+            norm_line = []
             for key in values:
                 if key['node'] == 'd':
-                    if 'label' in key.keys():
-                        if len(line) > 0:  # pylint: disable=len-as-condition
-                            self.text.append(line)
-                        line = key['label'] + '. '
+                    if 'label' in key:
+                        if translit_line:
+                            transliteration.append(''.join(translit_line))
+                        if norm_line:
+                            normalization.append(''.join(norm_line))
+                        translit_line = [key['label'], '. ']
+                        norm_line = [key['label'], '. ']
                     else:
+                        if 'frag' in key:
+                            translit_line += [key['frag'], ' ']
                         try:
-                            line += key['frag'] + ' '
+                            norm_line += [key['f']['norm'], ' ']
                         except KeyError:
-                            line += ''
+                            pass
                 elif key['node'] == 'l':
-                    if len(line) == 0:  # pylint: disable=len-as-condition
-                        line = k.split(' -')[0] + '. '
+                    if not translit_line:
+                        translit_line = [label.split(' -')[0], '. ']
+                    if not norm_line:
+                        norm_line = [label.split(' -')[0], '. ']
                     try:
                         if '\\' in key['frag']:
-                            line += key['f']['form'] + ' '
+                            translit_line += [key['f']['form'], ' ']
                         else:
-                            line += key['frag'] + ' '
+                            translit_line += [key['frag'], ' ']
                     except KeyError:
-                        line += key['f']['form'] + ' '
-                elif key['node'] == 'c':
-                    if key['type'] == 'phrase':
-                        for node in key['cdl']:
-                            for k, v in node.items():
-                                if k == 'f':
-                                    line += v['form'] + ' '
-                    else:
-                        for node in key['cdl']:
-                            try:
-                                line += ' ' + node['frag']
-                            except KeyError:
-                                try:
-                                    line += ' ' + node['cdl'][0]['frag']
-                                except KeyError:
-                                    line += 'ERROR! '
-                else:
-                    line += '~~~'
-            self.text.append(line)
-        self.textdata['transliteration'] = self.text
-
-    def __normalization__(self):
-        """
-        Looks at either sentence or line-by-line structure and outputs
-        normalization.
-        :return: normalization found in each text's textdata.
-        """
-        self.__parse_sentence__()
-        self.text = []  # pylint: disable=attribute-defined-outside-init
-        for k, v in self.sentences.items():
-            self.text.append(k)
-            line = []
-            for key in v:
-                if key['node'] == 'd':
-                    if 'label' in key.keys():
-                        if len(line) > 0:  # pylint: disable=len-as-condition
-                            self.text.append(line)
-                        line = key['label'] + '. '
-                    else:
-                        try:
-                            line += key['f']['norm'] + ' '
-                        except KeyError:
-                            line += ''
-                elif key['node'] == 'l':
-                    if len(line) == 0:  # pylint: disable=len-as-condition
-                        line = k.split(' -')[0] + '. '
+                        translit_line += [key['f']['form'], ' ']
                     try:
                         if '\\' in key['f']['norm']:
-                            line += key['f']['form'] + ' '
+                            norm_line += [key['f']['form'], ' ']
                         else:
-                            line += key['f']['norm'] + ' '
+                            norm_line += [key['f']['norm'], ' ']
                     except KeyError:
-                        line += key['f']['form'] + ' '
+                        norm_line += [key['f']['form'], ' ']
                 elif key['node'] == 'c':
                     if key['type'] == 'phrase':
                         for node in key['cdl']:
-                            for k, v in node.items():
-                                if k == 'f':
-                                    line += v['form'] + ' '
+                            if 'f' in node:
+                                translit_line += [node['f']['form'], ' ']
+                                norm_line += [node['f']['form'], ' ']
                     else:
                         for node in key['cdl']:
                             try:
-                                line += ' ' + node['f']['norm']
+                                translit_line += [' ', node['frag']]
                             except KeyError:
                                 try:
-                                    line += ' ' + node['cdl'][0]['f']['norm']
+                                    translit_line += [' ', node['cdl'][0]['frag']]
                                 except KeyError:
-                                    line += 'ERROR! '
+                                    translit_line.append('ERROR! ')
+                            try:
+                                norm_line += [' ', node['f']['norm']]
+                            except KeyError:
+                                try:
+                                    norm_line += [' ', node['cdl'][0]['f']['norm']]
+                                except KeyError:
+                                    norm_line.append('ERROR! ')
                 else:
-                    line += '~~~'
-            self.text.append(line)
-        self.textdata['normalization'] = self.text
+                    translit_line.append('~~~')
+                    norm_line.append('~~~')
+            transliteration.append(''.join(translit_line))
+            normalization.append(''.join(norm_line))
+        self.text = normalization  # pylint: disable=attribute-defined-outside-init
+        self.textdata['transliteration'] = transliteration
+        self.textdata['normalization'] = normalization
 
     def __ingest_text__(self, call_number):  # pylint: disable=too-many-branches
         """
@@ -168,6 +149,9 @@ class Reader(object):
                  a list of failed texts (mostly due to being empty) that filters out
                  texts for print_toc.
         """
+        profile = oracc_profile.PROFILE
+        if profile is not None:
+            start = time.perf_counter()
         if 'text_file' in self.texts[call_number]:
             self.metadata = self.texts[call_number]  # pylint: disable=attribute-defined-outside-init
             self.textdata = self.texts[call_number]['text_file']  # pylint: disable= attribute-defined-outside-init
@@ -185,10 +169,13 @@ class Reader(object):
                             #     obj_detail.append(cdl['subtype'])
                             if cdl['node'] == 'c' and 'cdl' in cdl.keys():
                                 self.textanalysis = cdl['cdl']  # pylint: disable=attribute-defined-outside-init
-                                self.__transliteration__()
-                                self.__normalization__()
+                                self.__ingest_sentences__()
+            if profile is not None:
+                profile.record('ingest', time.perf_counter() - start, texts=1)
         else:
             self.failed_texts.append(call_number)
+            if profile is not None:
+                profile.record('ingest', failures=1)
             print('{text} did not ingest; text either empty or missing. '
                   '(Text Fail 1)'.format(text=call_number))
 
@@ -198,10 +185,17 @@ class Reader(object):
         :return: Each text "ingested"; see __ingest_text__ for more information.
         """
         print('Ingesting corpus...')
-        for call_number in self.texts:
-            self.__ingest_text__(call_number)
+        with oracc_profile.project(self.project(), replace=False):
+            for call_number in self.texts:
+                self.__ingest_text__(call_number)
         print()
 
+    def project(self):
+        """
+        :return: the project of the catalogue (e.g. saao/saa10), which names it in profiles.
+        """
+        return self.filedata.get('project', '')
+
     def print_toc(self):
         """
         Prints the items available for individual printing. Unviewable texts are
@@ -272,65 +266,44 @@ class Reader(object):
                 if k == 'cdl':
                     lines.append(v)
         for sets in lines:
-            line = []
+            line = []  # pieces of the current line, joined once it is done
             for key in sets:
                 if key['node'] == 'd':
-                    if 'label' in key.keys():
-                        if len(line) > 0:  # pylint: disable=len-as-condition
-                            self.tablet.append(line)
-                        line = key['label'] + '. '
-                    else:
-                        try:
-                            line += key['frag'] + ' '
-                        except KeyError:
-                            line += ''
+                    if 'label' in key:
+                        if line:
+                            self.tablet.append(''.join(line))
+                        line = [key['label'], '. ']
+                    elif 'frag' in key:
+                        line += [key['frag'], ' ']
                 elif key['node'] == 'l':
-                    if len(line) == 0:  # pylint: disable=len-as-condition
-                        if key.keys() != 'frag':
-                            line += key['f']['form'] + ' '
-                            self.tablet[-1] += ''.join(line)
-                            line = []
-                        else:
-                            if '\\' in key['frag']:
-                                line += key['f']['form'] + ' '
-                                self.tablet[-1] += ''.join(line)
-                                line = []
-                            else:
-                                line += key['frag'] + ' '
-                                self.tablet[-1] += ''.join(line)
-                                line = []
+                    if not line and self.tablet:
+                        # continues the line before
+                        self.tablet[-1] += key['f']['form'] + ' '
                     else:
                         try:
                             if '\\' in key['frag']:
-                                line += key['f']['form'] + ' '
+                                line += [key['f']['form'], ' ']
                             else:
-                                line += key['frag'] + ' '
+                                line += [key['frag'], ' ']
                         except KeyError:
-                            line += key['f']['form'] + ' '
+                            line += [key['f']['form'], ' ']
                 elif key['node'] == 'c':
                     if key['type'] == 'phrase':
-                        if len(line) == 0:  # pylint: disable=len-as-condition
-                            for node in key['cdl']:
-                                for k, v in node.items():
-                                    if k == 'f':
-                                        line += v['form'] + ' '
-                                        self.text[-1] += ''.join(line)
-                                        line = []
+                        forms = [node['f']['form'] + ' ' for node in key['cdl'] if 'f' in node]
+                        if not line and self.tablet:
+                            self.tablet[-1] += ''.join(forms)
                         else:
-                            for node in key['cdl']:
-                                for k, v in node.items():
-                                    if k == 'f':
-                                        line += v['form'] + ' '
+                            line += forms
                     else:
                         for node in key['cdl']:
                             try:
-                                line += ' ' + node['frag']
+                                line += [' ', node['frag']]
                             except KeyError:
                                 try:
-                                    line += ' ' + node['cdl'][0]['frag']
+                                    line += [' ', node['cdl'][0]['frag']]
                                 except KeyError:
-                                    line += 'ERROR! '
+                                    line.append('ERROR! ')
                 else:
-                    line += '~~~'
-            self.tablet.append(line)
+                    line.append('~~~')
+            self.tablet.append(''.join(line))
         print('\n'.join(self.tablet))
@@ -0,0 +1,254 @@
+"""
+Benchmarks for the import, parse, extraction and query hot paths.
+
+Everything runs offline on a synthetic ORACC-shaped project, so runs can be
+compared between machines and commits:
+
+    python oracc_benchmark.py --texts 2000 --tokens 200 --output bench.json
+
+Each scenario is timed `--repeat` times and then run once more under
+tracemalloc for its peak memory; the results are written as JSON.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import oracc_corpus
+from jsonreader import Reader
+from oracc_importer import FileImport
+from oracc_text import extract_layers, grab_all
+
+# (frag, form, norm, sense) of the synthetic vocabulary
+WORDS = [
+    ("a-na", "a-na", "ana", "to"),
+    ("LUGAL", "LUGAL", "šarri", "king"),
+    ("be-li₂-ia", "be-li₂-ia", "bēlīya", "my lord"),
+    ("ARAD-ka", "ARAD-ka", "urdaka", "your servant"),
+    ("{d}AG", "{d}AG", "Nabû", "Nabu"),
+    ("{d}AMAR.UTU", "{d}AMAR.UTU", "Marduk", "Marduk"),
+    ("lu", "lu", "lū", "may"),
+    ("šul-mu", "šul-mu", "šulmu", "well-being"),
+    ("a-dan-niš", "a-dan-niš", "adanniš", "very"),
+    ("[...]", "[...]", "x", "x"),
+]
+AUTHORS = ["Adad-šumu-uṣur", "Balasî", "Issar-šumu-ereš", "Nabû-ahhe-eriba"]
+GENRES = ["letter", "query", "report", "decree"]
+
+
+def make_word(rng: random.Random, depth: int) -> Dict[str, Any]:
+    frag, form, norm, sense = rng.choice(WORDS)
+    if rng.random() < 0.1:
+        # a variable number of synthetic word forms keeps the vocabulary large
+        norm = f"{norm}{rng.randrange(1000)}"
+    node: Dict[str, Any] = {
+        "node": "l",
+        "frag": frag,
+        "ref": "r",
+        "f": {"lang": "akk", "form": form, "norm": norm, "sense": sense},
+    }
+    for _ in range(depth):
+        node = {"node": "c", "type": "phrase", "cdl": [node]}
+    return node
+
+
+def make_text(
+    rng: random.Random, pnum: str, tokens: int, depth: int, line_length: int
+) -> Dict[str, Any]:
+    nodes: List[Dict[str, Any]] = []
+    for i in range(tokens):
+        if i % line_length == 0:
+            label = f"o {i // line_length + 1}"
+            nodes.append({"node": "d", "type": "line-start", "label": label})
+        nodes.append(make_word(rng, depth))
+    sentence = {"node": "c", "type": "sentence", "label": "o 1", "cdl": nodes}
+    body = {"node": "c", "type": "discourse", "subtype": "body", "cdl": [sentence]}
+    return {
+        "type": "cdl",
+        "project": "bench",
+        "textid": pnum,
+        "cdl": [{"node": "c", "type": "text", "cdl": [body]}],
+    }
+
+
+def make_corpus(
+    directory: str,
+    texts: int = 500,
+    tokens: int = 100,
+    depth: int = 0,
+    line_length: int = 8,
+    seed: int = 0,
+) -> str:
+    """
+    Writes a synthetic ORACC project (catalogue.json, metadata.json,
+    corpus.json and corpusjson/*.json) to `directory` and returns the path of
+    its catalogue. `depth` wraps every word in that many phrase nodes.
+    """
+    rng = random.Random(seed)
+    root = Path(directory)
+    (root / "corpusjson").mkdir(parents=True, exist_ok=True)
+    catalogue: Dict[str, Any] = {}
+    members: Dict[str, str] = {}
+    for i in range(texts):
+        pnum = f"P{i:06d}"
+        members[pnum] = f"corpusjson/{pnum}.json"
+        catalogue[pnum] = {
+            "id_text": pnum,
+            "designation": f"Bench {i}",
+            "ancient_author": rng.choice(AUTHORS),
+            "genre": rng.choice(GENRES),
+            "period": "Neo-Assyrian",
+        }
+        text = make_text(rng, pnum, tokens, depth, line_length)
+        with open(root / members[pnum], "w", encoding="utf8") as f:
+            json.dump(text, f, ensure_ascii=False)
+    files = {
+        "catalogue.json": {"type": "catalogue", "members": catalogue},
+        "metadata.json": {
+            "config": {"name": "Bench", "blurb": "synthetic", "pathname": "bench"}
+        },
+        "corpus.json": {"type": "corpus", "members": members},
+    }
+    for name, data in files.items():
+        with open(root / name, "w", encoding="utf8") as f:
+            json.dump(data, f, ensure_ascii=False)
+    return str(root / "catalogue.json")
+
+
+def measure(name: str, fn: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    seconds = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            seconds.append(time.perf_counter() - start)
+        tracemalloc.start()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {
+        "name": name,
+        "seconds": seconds,
+        "best": min(seconds),
+        "median": statistics.median(seconds),
+        "peak_bytes": peak,
+    }
+
+
+def scenarios(directory: str) -> Dict[str, Callable[[], Any]]:
+    catalogue = str(Path(directory) / "catalogue.json")
+    texts = [
+        json.loads(path.read_text(encoding="utf8"))
+        for path in sorted((Path(directory) / "corpusjson").glob("*.json"))
+    ]
+
+    def file_import():
+        fi = FileImport(catalogue)
+        fi.read_catalogue()
+        fi.load_corpus()
+        return fi
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        imported = file_import()
+    corpus = oracc_corpus.guess_filenames(directory)
+    words = [word[2] for word in WORDS]
+
+    def kwic_cold():
+        corpus.indexes = {}
+        for word in words:
+            corpus.kwic(word)
+
+    def kwic_warm():
+        for word in words:
+            corpus.kwic(word)
+
+    return {
+        "FileImport.load_corpus": file_import,
+        "Reader.ingest_corpus": lambda: Reader(imported.filedata).ingest_corpus(),
+        "ORACC_Corpus.load_corpus": lambda: oracc_corpus.guess_filenames(directory),
+        "grab_all": lambda: [
+            grab_all(t, layer) for t in texts for layer in ("norm", "frag")
+        ],
+        "extract_layers": lambda: [extract_layers(t) for t in texts],
+        "ORACC_Corpus.kwic (cold index)": kwic_cold,
+        "ORACC_Corpus.kwic (warm index)": kwic_warm,
+    }
+
+
+def run(
+    texts: int = 500,
+    tokens: int = 100,
+    depth: int = 0,
+    repeat: int = 3,
+    seed: int = 0,
+    directory: str = "",
+    only: List[str] = [],
+) -> Dict[str, Any]:
+    params = {
+        "texts": texts,
+        "tokens": tokens,
+        "depth": depth,
+        "repeat": repeat,
+        "seed": seed,
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = os.path.abspath(directory or tmp)
+        if not (Path(directory) / "catalogue.json").exists():
+            make_corpus(directory, texts, tokens, depth, seed=seed)
+        results = [
+            measure(name, fn, repeat)
+            for name, fn in scenarios(directory).items()
+            if not only or any(part in name for part in only)
+        ]
+    return {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "params": params,
+        "results": results,
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--texts", type=int, default=500)
+    parser.add_argument("--tokens", type=int, default=100, help="tokens per text")
+    parser.add_argument("--depth", type=int, default=0, help="extra CDL nesting")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--directory", default="", help="reuse (or keep) the synthetic corpus here"
+    )
+    parser.add_argument(
+        "--only", action="append", default=[], help="run matching scenarios only"
+    )
+    parser.add_argument("--output", default="", help="write JSON here, not stdout")
+    args = parser.parse_args(argv)
+    report = run(
+        args.texts,
+        args.tokens,
+        args.depth,
+        args.repeat,
+        args.seed,
+        args.directory,
+        args.only,
+    )
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf8")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
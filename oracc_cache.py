@@ -0,0 +1,108 @@
+import hashlib
+import os
+import pickle
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from array import array
+
+from oracc_text import CDLLayers, ORACC_Text, Vocabulary
+
+# bump whenever the layout of the cached data changes
+CACHE_VERSION = 3
+
+
+class CachedFile:
+    """
+    This class stands in for a FileReader whose data came out of the cache.
+    """
+
+    def __init__(self, filename: str, data: Dict[str, Any]):
+        self.filename = filename
+        self.data: Dict[str, Any] = data
+
+
+class CorpusCache:
+    """
+    This class keeps the derived data of ORACC projects (token layers and line
+    boundaries per text, plus the catalogue, metadata and corpus files) in a
+    pickle per project under `directory`.
+    Every entry is stored with the fingerprint of its source file (mtime and
+    size on disk, CRC and size in a zip), so stale texts can be told apart
+    from the ones that can be reused as they are.
+    """
+
+    def __init__(self, directory: str):
+        self.directory: Path = Path(directory)
+
+    def filename(self, corpus) -> Path:
+        location = corpus.source.locate(corpus.corpus_file)
+        digest = hashlib.sha1(location.encode("utf8")).hexdigest()[:16]
+        return self.directory / f"{digest}.pickle"
+
+    def load(self, corpus) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.filename(corpus), "rb") as f:
+                data = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+            return None
+        return data
+
+    def save(self, corpus, data: Dict[str, Any]) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        filename = self.filename(corpus)
+        # write next to the target and swap, so readers never see half a file
+        tmp = filename.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(
+                dict(data, version=CACHE_VERSION), f, protocol=pickle.HIGHEST_PROTOCOL
+            )
+        os.replace(tmp, filename)
+
+
+def text_entry(text: ORACC_Text, fingerprint, vocab: Vocabulary) -> Dict[str, Any]:
+    """
+    The cached form of a text. Token ids are re-encoded against `vocab`, the
+    vocabulary stored with the cache, since the ids of a running process mean
+    nothing to the next one.
+    """
+    layers = text.get_layers()
+    return {
+        "fingerprint": fingerprint,
+        "path": text.path,
+        "ids": {key: vocab.encode(layers.tokens(key)) for key in layers.ids},
+        "labels": vocab.encode(layers.vocab.decode(layers.labels)),
+        "offsets": layers.offsets,
+    }
+
+
+def cached_text(
+    pnum: str,
+    entry: Dict[str, Any],
+    metadata: Dict[str, Any],
+    source,
+    vocab: Vocabulary,
+    mapping: array,
+    keep_json: bool = True,
+) -> ORACC_Text:
+    """
+    Rebuilds a text from its cached form; `mapping` translates the ids of the
+    cache vocabulary to those of `vocab`.
+    """
+    # the CDL file itself is only read again if `json` is asked for
+    text = ORACC_Text(
+        metadata=metadata,
+        pnum=pnum,
+        path=entry["path"],
+        source=source,
+        vocab=vocab,
+        keep_json=keep_json,
+    )
+    remap = mapping.__getitem__
+    layers = text.layers = CDLLayers(entry["ids"], vocab)
+    layers.ids = {key: array("I", map(remap, ids)) for key, ids in entry["ids"].items()}
+    layers.labels = array("I", map(remap, entry["labels"]))
+    layers.offsets = entry["offsets"]
+    return text
@@ -0,0 +1,250 @@
+"""
+Batch processing of many ORACC projects from the command line.
+
+Every project below a json-master root (extracted, or still in its .zip)
+that matches one of the --projects patterns is loaded, its layers are
+extracted and its frequency and KWIC reports are written to a json file of
+its own under --output:
+
+    python oracc_cli.py ~/json-master --projects 'saao/*' 'rinap/*' \\
+        --kwic šarri --output reports
+
+Projects run as separate tasks on a process pool, the largest first, so the
+long ones do not hold up the end of the run. A project whose result file is
+already there is skipped, so an interrupted run picks up where it stopped
+(--force redoes everything).
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from zipfile import ZipFile
+
+import oracc_profile
+from oracc_collection import find_projects
+from oracc_corpus import guess_filenames
+from oracc_importer import ORACCUnzip
+
+
+def select_projects(
+    root: str, patterns: Optional[List[str]] = None
+) -> Dict[str, Tuple[str, str]]:
+    projects = find_projects(root)
+    if not patterns:
+        return projects
+    return {
+        name: location
+        for name, location in projects.items()
+        if any(fnmatch(name, pattern) for pattern in patterns)
+    }
+
+
+def project_size(location: str, project: str) -> int:
+    """
+    The number of bytes of CDL json of a project, to schedule the largest
+    projects first.
+    """
+    prefix = f"{project}/corpusjson/" if project else "corpusjson/"
+    if location.endswith(".zip"):
+        with ZipFile(location) as archive:
+            return sum(
+                info.file_size
+                for info in archive.infolist()
+                if info.filename.startswith(prefix)
+            )
+    folder = Path(location) / prefix
+    if not folder.is_dir():
+        return 0
+    return sum(entry.stat().st_size for entry in os.scandir(folder))
+
+
+def result_file(output: str, name: str) -> Path:
+    return Path(output) / f"{name.replace('/', '__')}.json"
+
+
+def process_project(
+    name: str, location: str, project: str, options: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    Loads one project and writes its report; runs on a pool worker.
+    :return: a summary of the project for the progress output.
+    """
+    start = time.perf_counter()
+    profile = oracc_profile.enable() if options["profile"] else None
+    try:
+        with oracc_profile.project(name):
+            corpus = guess_filenames(
+                location,
+                project,
+                keep_json=False,
+                cache_dir=options["cache_dir"],
+            )
+            layers = {}
+            for layer in options["layers"]:
+                counts = corpus.frequencies(layer)
+                layers[layer] = {
+                    "tokens": sum(counts.values()),
+                    "types": len(counts),
+                    "frequencies": counts.most_common(options["top"]),
+                    "kwic": {
+                        word: [
+                            " ".join(line)
+                            for line in corpus.kwic(word, options["window"], layer)
+                        ]
+                        for word in options["kwic"]
+                    },
+                }
+    finally:
+        if profile is not None:
+            oracc_profile.disable()
+    result = {
+        "project": name,
+        "name": corpus.name,
+        "texts": len(corpus.texts),
+        "seconds": time.perf_counter() - start,
+        "layers": layers,
+    }
+    if profile is not None:
+        result["profile"] = profile.report()
+    filename = result_file(options["output"], name)
+    # write next to the target and swap, so a killed run leaves no half file
+    tmp = filename.with_name(f"{filename.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(result, ensure_ascii=False, indent=1), encoding="utf8")
+    os.replace(tmp, filename)
+    return {key: result[key] for key in ("project", "name", "texts", "seconds")}
+
+
+def run(
+    root: str,
+    patterns: Optional[List[str]] = None,
+    output: str = "oracc-reports",
+    workers: int = 0,
+    layers: List[str] = ["norm", "translit"],
+    kwic: List[str] = [],
+    window: int = 2,
+    top: int = 100,
+    cache_dir: Optional[str] = None,
+    unzip: Optional[str] = None,
+    force: bool = False,
+    profile: bool = False,
+) -> Dict[str, Any]:
+    if unzip:
+        # plain names can be handed to the unzipper, patterns only filter later
+        prefixes = (
+            [p for p in patterns if not any(c in p for c in "*?[")]
+            if patterns
+            else None
+        )
+        ORACCUnzip(root, unzip).unzip(
+            workers or None, projects=prefixes if prefixes else None
+        )
+        root = os.path.join(unzip, "ORACC-Files")
+    Path(output).mkdir(parents=True, exist_ok=True)
+    projects = select_projects(root, patterns)
+    done = [
+        name for name in projects if not force and result_file(output, name).exists()
+    ]
+    todo = sorted(
+        (name for name in projects if name not in done),
+        key=lambda name: project_size(*projects[name]),
+        reverse=True,
+    )
+    options = {
+        "output": output,
+        "layers": layers,
+        "kwic": kwic,
+        "window": window,
+        "top": top,
+        "cache_dir": cache_dir,
+        "profile": profile,
+    }
+    log(f"{len(projects)} projects, {len(done)} already done, {len(todo)} to run")
+    summary: Dict[str, Any] = {"done": done, "processed": {}, "failed": {}}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers or None) as pool:
+        jobs = {
+            pool.submit(process_project, name, *projects[name], options): name
+            for name in todo
+        }
+        for i, job in enumerate(as_completed(jobs), 1):
+            name = jobs[job]
+            try:
+                result = job.result()
+            except Exception as e:  # a broken project should not stop the rest
+                summary["failed"][name] = f"{type(e).__name__}: {e}"
+                log(f"[{i}/{len(todo)}] {name}: failed ({type(e).__name__}: {e})")
+                continue
+            summary["processed"][name] = result
+            log(
+                f"[{i}/{len(todo)}] {name}: {result['texts']} texts "
+                f"in {result['seconds']:.1f}s"
+            )
+    summary["seconds"] = time.perf_counter() - start
+    with open(Path(output) / "summary.json", "w", encoding="utf8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=1)
+    log(
+        f"{len(summary['processed'])} processed, {len(summary['failed'])} failed "
+        f"in {summary['seconds']:.1f}s"
+    )
+    return summary
+
+
+def log(message: str) -> None:
+    # progress goes to stderr, so stdout stays free for the caller
+    print(message, file=sys.stderr, flush=True)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("root", help="json-master root, or a folder of project zips")
+    parser.add_argument(
+        "--projects", nargs="*", default=None, help="project names or patterns"
+    )
+    parser.add_argument("--output", default="oracc-reports")
+    parser.add_argument(
+        "--workers", type=int, default=0, help="processes (default: one per CPU)"
+    )
+    parser.add_argument(
+        "--layer",
+        dest="layers",
+        action="append",
+        choices=["norm", "translit", "form", "sense"],
+        help="token layers to report on (default: norm and translit)",
+    )
+    parser.add_argument("--kwic", nargs="*", default=[], help="words to look up")
+    parser.add_argument("--window", type=int, default=2)
+    parser.add_argument("--top", type=int, default=100, help="most frequent tokens")
+    parser.add_argument("--cache-dir", default=None)
+    parser.add_argument(
+        "--unzip", default=None, help="extract the zips under root here first"
+    )
+    parser.add_argument("--force", action="store_true", help="redo finished projects")
+    parser.add_argument(
+        "--profile", action="store_true", help="add stage timings to the results"
+    )
+    args = parser.parse_args(argv)
+    summary = run(
+        args.root,
+        args.projects,
+        args.output,
+        args.workers,
+        args.layers or ["norm", "translit"],
+        args.kwic,
+        args.window,
+        args.top,
+        args.cache_dir,
+        args.unzip,
+        args.force,
+        args.profile,
+    )
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
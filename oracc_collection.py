@@ -0,0 +1,227 @@
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from zipfile import BadZipFile, ZipFile
+
+import oracc_profile
+from oracc_corpus import ORACC_Corpus, guess_filenames
+from oracc_fetch import Fetcher, default_fetcher, parse_translation
+from oracc_index import MetadataIndex
+from oracc_reader import zip_projects
+from oracc_text import VOCABULARY
+
+PROJECT_FILES = ("catalogue.json", "metadata.json", "corpus.json")
+
+
+def find_projects(root: str) -> Dict[str, Tuple[str, str]]:
+    """
+    Finds every ORACC project below `root`, nested ones (saao/saa01, ...)
+    included, whether extracted or still inside a project .zip. Returns the
+    project name mapped to a (directory or zip, project inside it) pair that
+    guess_filenames understands.
+    """
+    projects: Dict[str, Tuple[str, str]] = {}
+    for folder, dirs, files in os.walk(root):
+        dirs.sort()
+        if all(name in files for name in PROJECT_FILES):
+            name = Path(folder).relative_to(root).as_posix()
+            projects[name] = (str(root), "" if name == "." else name)
+        for file in sorted(files):
+            if file.endswith(".zip"):
+                archive = os.path.join(folder, file)
+                try:
+                    with ZipFile(archive) as f:
+                        found = zip_projects(f.namelist())
+                except (BadZipFile, OSError):
+                    # a broken download; archives that hold no project (e.g.
+                    # ogsl) simply list none
+                    continue
+                for project in found:
+                    # extracted copies win over the archive they came from
+                    projects.setdefault(project or Path(file).stem, (archive, project))
+    return dict(sorted(projects.items()))
+
+
+class ORACC_Collection(ORACC_Corpus):
+    """
+    This class represent several ORACC projects queried as one corpus, e.g.
+    every project of a json-master download.
+
+    All projects are loaded through one worker pool and one cache directory
+    (see ORACC_Corpus for `workers`, `threads`, `lazy`, `cache_dir` and
+    `keep_json`), and
+    their texts are gathered in `texts` under "project:pnum" keys, so kwic,
+    frequencies, select and the author queries run over all of them at once.
+    `projects` restricts loading to project names matching any of the given
+    patterns (e.g. "saao/*"). Projects that fail to load are kept in `failed`.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        projects: Optional[List[str]] = None,
+        workers: int = 0,
+        threads: bool = False,
+        lazy: bool = False,
+        cache_dir: Optional[str] = None,
+        keep_json: bool = True,
+    ) -> None:
+        self.root: str = root
+        self.patterns: Optional[List[str]] = projects
+        self.dir: Path = Path(root)
+        self.source = None
+        self.catalog_file: str = ""
+        self.metadata_file: str = ""
+        self.corpus_file: str = ""
+        self.texts = {}
+        self.name: str = str(root)
+        self.blurb: str = ""
+        self.pathname: str = ""
+        self.filtered: bool = False
+        self.workers: int = workers
+        self.threads: bool = threads
+        self.lazy: bool = lazy
+        self.executor: Optional[Executor] = None
+        self.vocab = VOCABULARY
+        self.keep_json: bool = keep_json
+        self.cache = None
+        self.cache_dir: Optional[str] = cache_dir
+        self.corpora: Dict[str, ORACC_Corpus] = {}
+        self.failed: Dict[str, Exception] = {}
+        self.indexes = {}
+        self.matrices = {}
+        self.metadata_index = MetadataIndex()
+        self.order = {}
+        self.load_corpus()
+
+    def load_corpus(self) -> None:
+        self.indexes = {}
+        self.matrices = {}
+        self.corpora = {}
+        self.failed = {}
+        projects = self.find_projects()
+        if self.workers > 0 and not self.lazy:
+            pool_class = ThreadPoolExecutor if self.threads else ProcessPoolExecutor
+            with pool_class(max_workers=self.workers) as pool:
+                self.load_projects(projects, pool)
+        else:
+            self.load_projects(projects, None)
+        self.texts = {
+            f"{name}:{pnum}": text
+            for name, corpus in self.corpora.items()
+            for pnum, text in corpus.texts.items()
+        }
+        self.order = {key: i for i, key in enumerate(self.texts)}
+        self.metadata_index = MetadataIndex()
+        for key, text in self.texts.items():
+            self.metadata_index.add_text(key, text.metadata)
+
+    def find_projects(self) -> Dict[str, Tuple[str, str]]:
+        projects = find_projects(self.root)
+        if self.patterns is None:
+            return projects
+        return {
+            name: location
+            for name, location in projects.items()
+            if any(fnmatch(name, pattern) for pattern in self.patterns)
+        }
+
+    def refresh(self) -> Dict[str, List[str]]:
+        """
+        Refreshes every project (see ORACC_Corpus.refresh), loads projects
+        that appeared under `root` and drops the ones that are gone, on one
+        worker pool like load_corpus.
+        :return: the "project:pnum" keys that were added, changed and removed.
+        """
+        if self.workers > 0 and not self.lazy:
+            pool_class = ThreadPoolExecutor if self.threads else ProcessPoolExecutor
+            with pool_class(max_workers=self.workers) as pool:
+                return self.refresh_projects(pool)
+        return self.refresh_projects(None)
+
+    def refresh_projects(self, executor: Optional[Executor]) -> Dict[str, List[str]]:
+        changes: Dict[str, List[str]] = {"added": [], "changed": [], "removed": []}
+        projects = self.find_projects()
+        for name in [name for name in self.corpora if name not in projects]:
+            corpus = self.corpora.pop(name)
+            changes["removed"].extend(f"{name}:{pnum}" for pnum in corpus.texts)
+        for name, location in projects.items():
+            corpus = self.corpora.get(name)
+            if corpus is None:
+                self.failed.pop(name, None)
+                self.load_projects({name: location}, executor)
+                if name in self.corpora:
+                    changes["added"].extend(
+                        f"{name}:{pnum}" for pnum in self.corpora[name].texts
+                    )
+                continue
+            corpus.executor = executor
+            try:
+                with oracc_profile.project(name):
+                    project_changes = corpus.refresh()
+            except Exception as e:  # a broken project should not stop the rest
+                self.failed[name] = e
+                if oracc_profile.PROFILE is not None:
+                    oracc_profile.PROFILE.record("refresh", failures=1, project=name)
+                continue
+            finally:
+                corpus.executor = None
+            for kind, pnums in project_changes.items():
+                changes[kind].extend(f"{name}:{pnum}" for pnum in pnums)
+        previous = self.alltexts if self.filtered else self.texts
+        self.replace_texts(
+            {
+                f"{name}:{pnum}": text
+                for name, corpus in self.corpora.items()
+                for pnum, text in corpus.texts.items()
+            }
+        )
+        self.reindex(
+            previous, changes["removed"] + changes["changed"] + changes["added"]
+        )
+        return changes
+
+    def load_projects(
+        self, projects: Dict[str, Tuple[str, str]], executor: Optional[Executor]
+    ) -> None:
+        for name, (location, project) in projects.items():
+            try:
+                with oracc_profile.project(name):
+                    self.corpora[name] = guess_filenames(
+                        location,
+                        project,
+                        lazy=self.lazy,
+                        cache_dir=self.cache_dir,
+                        executor=executor,
+                        keep_json=self.keep_json,
+                    )
+                # the pool is only lent for the load, it is shut down after
+                self.corpora[name].executor = None
+            except Exception as e:  # a broken project should not stop the rest
+                self.failed[name] = e
+                if oracc_profile.PROFILE is not None:
+                    oracc_profile.PROFILE.record("load", failures=1, project=name)
+
+    def grab_translations(
+        self, fetcher: Optional[Fetcher] = None
+    ) -> Dict[str, List[str]]:
+        fetcher = fetcher if fetcher is not None else default_fetcher()
+        urls = {
+            f"{name}:{pnum}": fetcher.translation_url(corpus.pathname or name, pnum)
+            for name, corpus in self.corpora.items()
+            for pnum in corpus.texts
+            if f"{name}:{pnum}" in self.texts
+        }
+        pages = fetcher.get_many(urls.values())
+        return {
+            key: parse_translation(pages[url])
+            for key, url in urls.items()
+            if url in pages
+        }
+
+    def save_cache(self) -> None:
+        for corpus in self.corpora.values():
+            if corpus.cache is not None:
+                corpus.save_cache()
@@ -0,0 +1,244 @@
+"""
+A columnar on-disk format for the extracted layers of a corpus.
+
+    corpus.export("saa10.oracc")
+    corpus = ColumnarCorpus("saa10.oracc")
+
+The file holds a fixed header, a number of aligned sections and a json
+manifest at the end that lists the sections:
+    vocab, vocab_offsets      the token strings (utf8) and where each starts
+    ids.<key>, starts.<key>   the token ids of every text of a CDL key, one
+                              after the other, and where each text starts
+    labels, offsets.<key>     the line labels (as ids) and, per key, the
+                              number of tokens before each line
+    lines                     where the lines of each text start
+    catalogue                 the catalogue metadata of the texts, as json
+ColumnarCorpus maps the file and hands out memoryview slices of it, so
+opening one parses no CDL at all and processes that open the same file
+share its pages.
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from oracc_corpus import ORACC_Corpus
+from oracc_index import MetadataIndex
+from oracc_reader import decode
+from oracc_text import LAYERS, CDLLayers, ORACC_Text, Vocabulary
+
+MAGIC = b"ORACCCOL"
+# bump whenever the layout of the sections changes
+COLUMNAR_VERSION = 1
+# magic, version, manifest offset and manifest length
+HEADER = struct.Struct("<8sIxxxxQQ")
+ALIGNMENT = 8
+
+
+class ColumnarWriter:
+    """
+    This class writes the sections of a columnar file one after the other,
+    each starting at a multiple of ALIGNMENT, and keeps the manifest of
+    where they are.
+    """
+
+    def __init__(self, f):
+        self.f = f
+        self.sections: Dict[str, Tuple[int, int, str]] = {}
+        f.write(b"\0" * HEADER.size)
+
+    def write(self, name: str, data: bytes, format: str = "B") -> None:
+        padding = -self.f.tell() % ALIGNMENT
+        self.f.write(b"\0" * padding)
+        self.sections[name] = (self.f.tell(), len(data), format)
+        self.f.write(data)
+
+    def close(self, manifest: Dict[str, Any]) -> None:
+        manifest = dict(manifest, sections=self.sections)
+        raw = json.dumps(manifest, ensure_ascii=False).encode("utf8")
+        offset = self.f.tell()
+        self.f.write(raw)
+        self.f.seek(0)
+        self.f.write(HEADER.pack(MAGIC, COLUMNAR_VERSION, offset, len(raw)))
+
+
+def export_corpus(corpus, filename: str, keys=LAYERS) -> None:
+    """
+    Writes the layers of every text in `corpus` (a corpus, a collection or a
+    view) to `filename`.
+    """
+    filename = Path(filename)
+    # write next to the target and swap, so readers never see half a file
+    tmp = filename.with_name(f"{filename.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        write_corpus(corpus, f, keys)
+    os.replace(tmp, filename)
+
+
+def write_corpus(corpus, f, keys=LAYERS) -> None:
+    """
+    Writes the columnar form of `corpus` to the seekable binary file `f`.
+    Token ids are re-encoded against a vocabulary of their own, which is
+    stored along with them.
+    """
+    vocab = Vocabulary()
+    texts = list(corpus.texts.items())
+    ids = {key: array("I") for key in keys}
+    starts = {key: array("Q", [0]) for key in keys}
+    offsets = {key: array("I") for key in keys}
+    labels = array("I")
+    lines = array("Q", [0])
+    for _, text in texts:
+        layers = text.get_layers()
+        for key in keys:
+            ids[key].extend(vocab.encode(layers.tokens(key)))
+            starts[key].append(len(ids[key]))
+            offsets[key].extend(layers.offsets[key])
+        labels.extend(vocab.encode(layers.vocab.decode(layers.labels)))
+        lines.append(len(labels))
+    encoded = [token.encode("utf8") for token in vocab.tokens]
+    vocab_offsets = array("Q", [0])
+    for token in encoded:
+        vocab_offsets.append(vocab_offsets[-1] + len(token))
+    catalogue = {key: text.metadata for key, text in texts}
+    writer = ColumnarWriter(f)
+    writer.write("vocab", b"".join(encoded))
+    writer.write("vocab_offsets", vocab_offsets.tobytes(), "Q")
+    for key in keys:
+        writer.write(f"ids.{key}", ids[key].tobytes(), "I")
+        writer.write(f"starts.{key}", starts[key].tobytes(), "Q")
+        writer.write(f"offsets.{key}", offsets[key].tobytes(), "I")
+    writer.write("labels", labels.tobytes(), "I")
+    writer.write("lines", lines.tobytes(), "Q")
+    writer.write("catalogue", json.dumps(catalogue, ensure_ascii=False).encode("utf8"))
+    writer.close(
+        {
+            "byteorder": sys.byteorder,
+            "name": corpus.name,
+            "blurb": corpus.blurb,
+            "pathname": corpus.pathname,
+            "keys": list(keys),
+            "texts": [key for key, _ in texts],
+        }
+    )
+
+
+def read_manifest(buffer) -> Dict[str, Any]:
+    magic, version, offset, length = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a columnar ORACC corpus")
+    if version != COLUMNAR_VERSION:
+        raise ValueError(f"Unsupported columnar format version: {version}")
+    manifest = json.loads(bytes(buffer[offset : offset + length]).decode("utf8"))
+    if manifest["byteorder"] != sys.byteorder:
+        raise ValueError(f"The corpus was written {manifest['byteorder']} endian")
+    return manifest
+
+
+def section(view: memoryview, manifest: Dict[str, Any], name: str) -> memoryview:
+    offset, length, format = manifest["sections"][name]
+    return view[offset : offset + length].cast(format)
+
+
+def columnar_texts(
+    view: memoryview, manifest: Dict[str, Any], vocab: Vocabulary
+) -> Dict[str, ORACC_Text]:
+    """
+    Builds the texts of a mapped columnar file; their layers are slices of
+    `view`, nothing is copied.
+    """
+    keys = manifest["keys"]
+    ids = {key: section(view, manifest, f"ids.{key}") for key in keys}
+    starts = {key: section(view, manifest, f"starts.{key}").tolist() for key in keys}
+    offsets = {key: section(view, manifest, f"offsets.{key}") for key in keys}
+    labels = section(view, manifest, "labels")
+    lines = section(view, manifest, "lines").tolist()
+    catalogue = decode(section(view, manifest, "catalogue"))
+    texts = {}
+    for i, key in enumerate(manifest["texts"]):
+        text = ORACC_Text(metadata=catalogue[key], pnum=key.split(":")[-1], vocab=vocab)
+        layers = text.layers = CDLLayers((), vocab)
+        layers.ids = {k: ids[k][starts[k][i] : starts[k][i + 1]] for k in keys}
+        layers.labels = labels[lines[i] : lines[i + 1]]
+        layers.offsets = {k: offsets[k][lines[i] : lines[i + 1]] for k in keys}
+        texts[key] = text
+    return texts
+
+
+def columnar_vocabulary(view: memoryview, manifest: Dict[str, Any]) -> Vocabulary:
+    blob = section(view, manifest, "vocab")
+    bounds = section(view, manifest, "vocab_offsets").tolist()
+    data = bytes(blob)
+    return Vocabulary(
+        data[start:end].decode("utf8") for start, end in zip(bounds, bounds[1:])
+    )
+
+
+class ColumnarCorpus(ORACC_Corpus):
+    """
+    This class represent a corpus read back from a columnar export (see
+    export_corpus). The file is memory-mapped: the token layers of its texts
+    are read straight from the mapped pages and no json is parsed but the
+    catalogue. The texts have no CDL json, everything else (tokens, lines,
+    kwic, select, statistics) works as on the corpus that was exported.
+    """
+
+    def __init__(self, filename: str) -> None:
+        self.filename: str = str(filename)
+        self.dir: Path = Path(filename).parent
+        self.source = None
+        self.catalog_file: str = ""
+        self.metadata_file: str = ""
+        self.corpus_file: str = ""
+        self.texts: Dict[str, ORACC_Text] = {}
+        self.name: str = ""
+        self.blurb: str = ""
+        self.pathname: str = ""
+        self.filtered: bool = False
+        self.workers: int = 0
+        self.threads: bool = False
+        self.lazy: bool = False
+        self.executor = None
+        self.keep_json: bool = False
+        self.cache = None
+        self.fingerprints: Dict[str, Any] = {}
+        self.indexes = {}
+        self.matrices = {}
+        self.metadata_index: MetadataIndex = MetadataIndex()
+        self.order: Dict[str, int] = {}
+        self.load_corpus()
+
+    def load_corpus(self) -> None:
+        with open(self.filename, "rb") as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.attach(memoryview(self.mmap))
+
+    def attach(self, view: memoryview) -> None:
+        # fills the corpus in from a buffer that holds a columnar export
+        manifest = read_manifest(view)
+        self.name = manifest["name"]
+        self.blurb = manifest["blurb"]
+        self.pathname = manifest["pathname"]
+        self.vocab = columnar_vocabulary(view, manifest)
+        self.indexes = {}
+        self.matrices = {}
+        self.texts = columnar_texts(view, manifest, self.vocab)
+        self.order = {key: i for i, key in enumerate(self.texts)}
+        self.metadata_index = MetadataIndex()
+        for key, text in self.texts.items():
+            self.metadata_index.add_text(key, text.metadata)
+
+    def location(self) -> str:
+        return self.filename
+
+    def __reduce__(self):
+        # sent to a worker process, the file is mapped there again
+        return (ColumnarCorpus, (self.filename,))
+
+    def refresh(self) -> Dict[str, List[str]]:
+        raise TypeError("A columnar export cannot be refreshed, export it again.")
@@ -1,24 +1,83 @@
-from oracc_text import ORACC_Text
-from typing import Dict, List
+from oracc_text import ORACC_Text, VOCABULARY, Vocabulary
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 from pathlib import Path
-from oracc_reader import FileReader
-import copy
+from oracc_reader import DirectorySource, SourceReader, ZipSource
+from oracc_cache import CachedFile, CorpusCache, cached_text, text_entry
+from oracc_index import MetadataIndex, SignIndex, TokenIndex
+from oracc_fetch import Fetcher, default_fetcher
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
+from collections import Counter
+from functools import partial
+import os
+import oracc_profile
 
 
-def guess_filenames(directory: str):
-    catalog_file = Path(directory) / "catalogue.json"
-    metadata_file = Path(directory) / "metadata.json"
-    corpus_file = Path(directory) / "corpus.json"
-    return ORACC_Corpus(str(catalog_file), str(metadata_file), str(corpus_file))
+def guess_filenames(directory: str, project: str = "", **kwargs):
+    # a downloaded project .zip is read in place, without extracting it
+    if str(directory).endswith(".zip"):
+        source = ZipSource(directory, project or None, kwargs.pop("decoder", None))
+        return ORACC_Corpus(
+            "catalogue.json", "metadata.json", "corpus.json", source=source, **kwargs
+        )
+    catalog_file = Path(directory) / project / "catalogue.json"
+    metadata_file = Path(directory) / project / "metadata.json"
+    corpus_file = Path(directory) / project / "corpus.json"
+    return ORACC_Corpus(
+        str(catalog_file), str(metadata_file), str(corpus_file), **kwargs
+    )
+
+
+def read_text(source, name: str) -> Dict[str, Any]:
+    # module level so that it can be pickled into a process pool
+    return source.read(name)
 
 
 class ORACC_Corpus:
     """
     This class represent a corpus or ORACC project.
+
+    By default texts are read one after the other. Pass `workers` > 0 to read
+    and parse the text files concurrently on a process pool (or a thread pool
+    with `threads=True`), or hand in an `executor` to share one pool between
+    several corpora; the resulting `texts` are identical either way.
+
+    With `lazy=True` only the catalogue, metadata and corpus files are read up
+    front: `texts` holds stubs that read their CDL file on first use.
+
+    Files are read through `source`, by default the directory of
+    `catalog_file`; pass a ZipSource (and names inside the project, e.g.
+    "catalogue.json") to read a project .zip without extracting it. `decoder`
+    picks the json parser of the default source (see oracc_reader.DECODERS).
+
+    Tokens are stored as id arrays into `vocab` (by default the vocabulary
+    shared by all corpora). With `keep_json=False` the raw json of every text
+    is dropped as soon as its tokens are extracted.
+
+    With a `cache_dir`, token lists and line splits are kept on disk (see
+    oracc_cache); a warm load only re-reads the texts whose file changed.
+
+    The catalogue metadata is indexed by field (see oracc_index.MetadataIndex),
+    so lookup, select and the author queries do not scan the texts.
     """
 
-    def __init__(self, catalog_file: str, metadata_file: str, corpus_file: str) -> None:
+    def __init__(
+        self,
+        catalog_file: str,
+        metadata_file: str,
+        corpus_file: str,
+        workers: int = 0,
+        threads: bool = False,
+        lazy: bool = False,
+        source=None,
+        cache_dir: Optional[str] = None,
+        executor: Optional[Executor] = None,
+        decoder: Optional[str] = None,
+        vocab: Optional[Vocabulary] = None,
+        keep_json: bool = True,
+    ) -> None:
         self.dir: Path = Path(catalog_file).parents[0]
+        self.source = source if source is not None else DirectorySource(decoder=decoder)
         self.catalog_file: str = catalog_file
         self.metadata_file: str = metadata_file
         self.corpus_file: str = corpus_file
@@ -27,94 +86,686 @@ class ORACC_Corpus:
         self.blurb: str = ""
         self.pathname: str = ""
         self.filtered: bool = False
+        self.workers: int = workers
+        self.threads: bool = threads
+        self.lazy: bool = lazy
+        self.executor: Optional[Executor] = executor
+        self.vocab: Vocabulary = vocab if vocab is not None else VOCABULARY
+        self.keep_json: bool = keep_json
+        self.cache: Optional[CorpusCache] = (
+            CorpusCache(cache_dir) if cache_dir is not None else None
+        )
+        self.fingerprints: Dict[str, Any] = {}
+        self.indexes: Dict[str, TokenIndex] = {}
+        # document-term matrices per layer, see term_matrix
+        self.matrices: Dict[str, Any] = {}
+        self.metadata_index: MetadataIndex = MetadataIndex()
+        self.order: Dict[str, int] = {}
         self.load_corpus()
 
     def load_corpus(self) -> None:
-        self.fi_catalog = FileReader(self.catalog_file)
-        self.fi_metadata = FileReader(self.metadata_file)
-        self.fi_corpus = FileReader(self.corpus_file)
+        with oracc_profile.project(self.location(), replace=False):
+            with oracc_profile.stage("load"):
+                self.read_corpus()
+
+    def location(self) -> str:
+        # names the project in profiles
+        return os.path.dirname(self.source.locate(self.corpus_file))
+
+    def read_corpus(self) -> None:
+        self.indexes = {}
+        self.matrices = {}
+        with oracc_profile.stage("cache_load"):
+            cached = self.cache.load(self) if self.cache is not None else None
+        with oracc_profile.stage("project_files"):
+            files = [self.catalog_file, self.metadata_file, self.corpus_file]
+            self.fingerprints = {name: self.source.fingerprint(name) for name in files}
+            outdated = cached is None or cached["files"] != self.fingerprints
+            if not outdated:
+                self.fi_catalog = CachedFile(self.catalog_file, cached["catalogue"])
+                self.fi_metadata = CachedFile(self.metadata_file, cached["metadata"])
+                self.fi_corpus = CachedFile(self.corpus_file, cached["corpus"])
+            else:
+                self.fi_catalog = SourceReader(self.source, self.catalog_file)
+                self.fi_metadata = SourceReader(self.source, self.metadata_file)
+                self.fi_corpus = SourceReader(self.source, self.corpus_file)
+            self.name = self.fi_metadata.data.get("config").get("name")
+            self.blurb = self.fi_metadata.data.get("config").get("blurb")
+            self.pathname = self.fi_metadata.data.get("config").get("pathname")
+            catalog = self.fi_catalog.data.get("members")
+            members = self.fi_corpus.data.get("members")
+        filenames = {pnum: str(self.dir / Path(path)) for pnum, path in members.items()}
+        entries = cached["texts"] if cached is not None else {}
+        reusable = {}
+        # fingerprints are kept for refresh, not only for the cache
+        for pnum, filename in filenames.items():
+            fingerprint = self.source.fingerprint(filename)
+            self.fingerprints[filename] = fingerprint
+            entry = entries.get(pnum)
+            if (
+                entry is not None
+                and entry["path"] == filename
+                and entry["fingerprint"] == fingerprint
+            ):
+                reusable[pnum] = entry
+        stale = [pnum for pnum in filenames if pnum not in reusable]
+        with oracc_profile.stage("read_texts", texts=0 if self.lazy else len(stale)):
+            if self.lazy:
+                data = {}
+            else:
+                data = dict(
+                    zip(stale, self.read_texts([filenames[pnum] for pnum in stale]))
+                )
+        with oracc_profile.stage("construct", texts=len(filenames)):
+            mapping = self.vocab.encode(cached["vocab"]) if reusable else None
+            for pnum, filename in filenames.items():
+                if pnum in reusable:
+                    self.texts[pnum] = cached_text(
+                        pnum,
+                        reusable[pnum],
+                        catalog.get(pnum),
+                        self.source,
+                        self.vocab,
+                        mapping,
+                        self.keep_json,
+                    )
+                else:
+                    self.texts[pnum] = ORACC_Text(
+                        data.get(pnum),
+                        catalog.get(pnum),
+                        pnum=pnum,
+                        path=filename,
+                        source=self.source,
+                        vocab=self.vocab,
+                        keep_json=self.keep_json,
+                    )
+                    if not self.keep_json and not self.lazy:
+                        self.texts[pnum].drop_json()
+        self.order = {pnum: i for i, pnum in enumerate(self.texts)}
+        with oracc_profile.stage("metadata_index"):
+            self.metadata_index = MetadataIndex()
+            for pnum, text in self.texts.items():
+                self.metadata_index.add_text(pnum, text.metadata)
+        # the texts of a lazy corpus that were never read are not outdated
+        outdated = outdated or len(reusable) < len(entries)
+        if self.cache is not None and (outdated or (stale and not self.lazy)):
+            self.save_cache()
+
+    def refresh(self) -> Dict[str, List[str]]:
+        """
+        Brings the corpus up to date with its files, e.g. after a new ORACC
+        snapshot was unpacked over it. The members of the corpus file and the
+        fingerprints of the text files are compared with the loaded state:
+        only added and changed texts are read, removed ones are dropped, and
+        the token indexes (and the cache, if any) are updated in place.
+        Views selected before the refresh keep the texts they had; their
+        searches (kwic, sign_search) leave out the texts that were changed or
+        removed since, as the indexes no longer describe those.
+        :return: the pnums that were added, changed and removed.
+        """
+        with oracc_profile.project(self.location(), replace=False):
+            with oracc_profile.stage("refresh"):
+                return self.update_texts()
+
+    def update_texts(self) -> Dict[str, List[str]]:
+        # see refresh
+        if isinstance(self.source, ZipSource):
+            # the archive may have been replaced under the open handle
+            self.source.close()
+        files = [self.catalog_file, self.metadata_file, self.corpus_file]
+        fingerprints = {name: self.source.fingerprint(name) for name in files}
+        changed_files = [
+            name for name in files if fingerprints[name] != self.fingerprints.get(name)
+        ]
+        if self.catalog_file in changed_files:
+            self.fi_catalog = SourceReader(self.source, self.catalog_file)
+        if self.metadata_file in changed_files:
+            self.fi_metadata = SourceReader(self.source, self.metadata_file)
+        if self.corpus_file in changed_files:
+            self.fi_corpus = SourceReader(self.source, self.corpus_file)
         self.name = self.fi_metadata.data.get("config").get("name")
         self.blurb = self.fi_metadata.data.get("config").get("blurb")
         self.pathname = self.fi_metadata.data.get("config").get("pathname")
-        for pnum, path in self.fi_corpus.data.get("members").items():
-            fi_text = FileReader(str(self.dir / Path(path)))
-            self.texts[pnum] = ORACC_Text(
-                fi_text.data, self.fi_catalog.data.get("members").get(pnum)
+        catalog = self.fi_catalog.data.get("members")
+        members = self.fi_corpus.data.get("members")
+        filenames = {pnum: str(self.dir / Path(path)) for pnum, path in members.items()}
+        for filename in filenames.values():
+            fingerprints[filename] = self.source.fingerprint(filename)
+        previous = self.alltexts if self.filtered else self.texts
+        added = [pnum for pnum in filenames if pnum not in previous]
+        changed = [
+            pnum
+            for pnum, filename in filenames.items()
+            if pnum in previous
+            and (
+                previous[pnum].path != filename
+                or fingerprints[filename] != self.fingerprints.get(filename)
+            )
+        ]
+        removed = [pnum for pnum in previous if pnum not in filenames]
+        stale = set(added) | set(changed)
+        if self.lazy:
+            data = {}
+        else:
+            pnums = [pnum for pnum in filenames if pnum in stale]
+            data = dict(
+                zip(pnums, self.read_texts([filenames[pnum] for pnum in pnums]))
+            )
+        texts = {}
+        for pnum, filename in filenames.items():
+            if pnum in stale:
+                texts[pnum] = ORACC_Text(
+                    data.get(pnum),
+                    catalog.get(pnum),
+                    pnum=pnum,
+                    path=filename,
+                    source=self.source,
+                    vocab=self.vocab,
+                    keep_json=self.keep_json,
+                )
+                if not self.keep_json and not self.lazy:
+                    texts[pnum].drop_json()
+            else:
+                texts[pnum] = previous[pnum]
+                if self.catalog_file in changed_files:
+                    texts[pnum].metadata = catalog.get(pnum)
+                    texts[pnum].ancient_author = texts[pnum].metadata["ancient_author"]
+        self.fingerprints = fingerprints
+        self.replace_texts(texts)
+        self.reindex(previous, removed + changed + added)
+        if self.cache is not None and (stale or removed or changed_files):
+            self.save_cache()
+        return {"added": added, "changed": changed, "removed": removed}
+
+    def replace_texts(self, texts: Dict[str, ORACC_Text]) -> None:
+        # keeps a filter on, and `order` the same object the views hold
+        if self.filtered:
+            self.alltexts = texts
+            self.texts = {pnum: texts[pnum] for pnum in self.texts if pnum in texts}
+        else:
+            self.texts = texts
+        self.matrices = {}
+        self.order.clear()
+        self.order.update((pnum, i) for i, pnum in enumerate(texts))
+
+    def reindex(self, previous: Dict[str, ORACC_Text], keys: Iterable[str]) -> None:
+        """
+        Updates the token indexes that have been built for the texts under
+        `keys`, whose text in `previous` was replaced, added or removed, and
+        the metadata index for every text whose catalogue entry changed.
+        """
+        texts = self.alltexts if self.filtered else self.texts
+        keys = list(keys)
+        for index in self.indexes.values():
+            layer = index.layer
+            for key in keys:
+                old = previous.get(key)
+                if old is not None and key in index:
+                    tokens = old.get_tokens(layer) if old.layers is not None else None
+                    index.remove_text(key, tokens)
+                if key in texts:
+                    index.add_text(key, texts[key].get_tokens(layer))
+            index.renumber(self.order)
+        for key in keys:
+            if key not in texts:
+                self.metadata_index.remove_text(key)
+        indexed = self.metadata_index.metadata
+        for key, text in texts.items():
+            if indexed.get(key) is not text.metadata:
+                self.metadata_index.add_text(key, text.metadata)
+
+    def save_cache(self) -> None:
+        """
+        Writes the derived data of every text that has been read so far to the
+        cache; texts of a lazy corpus that were never used are left out.
+        """
+        # filtered out texts stay in the cache
+        texts = self.alltexts if self.filtered else self.texts
+        vocab = Vocabulary()
+        with oracc_profile.stage("save_cache"):
+            self.cache.save(
+                self,
+                {
+                    "files": {
+                        name: self.fingerprints[name]
+                        for name in (
+                            self.catalog_file,
+                            self.metadata_file,
+                            self.corpus_file,
+                        )
+                    },
+                    "catalogue": self.fi_catalog.data,
+                    "metadata": self.fi_metadata.data,
+                    "corpus": self.fi_corpus.data,
+                    "texts": {
+                        pnum: text_entry(text, self.fingerprints[text.path], vocab)
+                        for pnum, text in texts.items()
+                        if text.loaded or text.layers is not None
+                    },
+                    "vocab": vocab.tokens,
+                },
             )
 
+    def read_texts(self, filenames: List[str]):
+        profile = oracc_profile.PROFILE
+        if profile is None:
+            return self.map_texts(read_text, filenames)
+        # the workers report what they read back to this process
+        fn = partial(
+            oracc_profile.collect,
+            read_text,
+            os.getpid(),
+            oracc_profile.current_project(),
+        )
+        results = list(self.map_texts(fn, filenames))
+        for _, stats in results:
+            if stats:
+                profile.merge(stats)
+        return [data for data, _ in results]
+
+    def map_texts(self, fn, filenames: List[str]):
+        sources = repeat(self.source, len(filenames))
+        if self.executor is not None and len(filenames) > 1:
+            # a pool shared with other corpora, see oracc_collection
+            chunksize = max(1, len(filenames) // 64)
+            return list(self.executor.map(fn, sources, filenames, chunksize=chunksize))
+        if self.workers <= 0 or len(filenames) < 2:
+            return map(fn, sources, filenames)
+        if self.threads:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                return list(pool.map(fn, sources, filenames))
+        # big chunks keep the pickling overhead per text low
+        chunksize = max(1, len(filenames) // (self.workers * 4))
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            return list(pool.map(fn, sources, filenames, chunksize=chunksize))
+
     def bow_norm(self) -> List[str]:
-        bow: List[str] = []
-        for text in self.texts:
-            for word in self.texts[text].get_norm():
-                bow.append(word)
-        return bow
+        return list(self.iter_tokens("norm"))
 
     def bow_translit(self) -> List[str]:
-        bow: List[str] = []
-        for text in self.texts:
-            for word in self.texts[text].get_translit():
-                bow.append(word)
-        return bow
-
-    def kwic(self, word: str, window: int = 2):
-        # not super happy about bracketing the word
+        return list(self.iter_tokens("translit"))
+
+    def iter_tokens(self, layer: str = "norm", release: bool = False) -> Iterator[str]:
+        """
+        Streams the tokens of every text, one text at a time. With
+        `release=True` each text is unloaded again once its tokens have been
+        yielded, so a lazy corpus streams without holding on to every text.
+        """
+        for text in self.texts.values():
+            yield from text.get_tokens(layer)
+            if release:
+                text.unload()
+
+    def iter_norm(self, release: bool = False) -> Iterator[str]:
+        return self.iter_tokens("norm", release)
+
+    def iter_translit(self, release: bool = False) -> Iterator[str]:
+        return self.iter_tokens("translit", release)
+
+    def frequencies(self, layer: str = "norm", release: bool = False) -> Counter:
+        """
+        Counts the tokens of `layer` while streaming over the texts, without
+        building the bag of words first.
+        """
+        counts: Counter = Counter()
+        for text in self.texts.values():
+            counts.update(text.get_tokens(layer))
+            if release:
+                text.unload()
+        return counts
+
+    def grab_translations(
+        self, fetcher: Optional[Fetcher] = None
+    ) -> Dict[str, List[str]]:
+        """
+        Fetches the translations of all texts from the ORACC website,
+        concurrently; texts whose page failed are left out (see
+        `fetcher.errors`).
+        """
+        fetcher = fetcher if fetcher is not None else default_fetcher()
+        return fetcher.translations(self.pathname, self.texts)
+
+    def document_term_matrix(
+        self,
+        layer: str = "norm",
+        fields: Sequence[str] = ("ancient_author", "genre", "period"),
+    ):
+        """
+        Returns a sparse texts × terms count matrix of `layer` with the given
+        catalogue fields alongside, for vectorized statistics (needs numpy,
+        see oracc_stats.DocumentTermMatrix).
+        """
+        from oracc_stats import DocumentTermMatrix
+
+        return DocumentTermMatrix(self, layer, fields)
+
+    def term_matrix(self, layer: str = "norm"):
+        """
+        Returns the document-term matrix of `layer` (without catalogue
+        fields) that ngrams and the collocation queries share; it is built
+        on first use and dropped whenever the texts change.
+        """
+        matrix = self.matrices.get(layer)
+        if matrix is None:
+            matrix = self.matrices[layer] = self.document_term_matrix(layer, ())
+        return matrix
+
+    def export(self, filename: str) -> None:
+        """
+        Writes the token layers, line splits and catalogue metadata of the
+        texts to one columnar file, which oracc_columnar.ColumnarCorpus maps
+        back in without parsing any CDL json.
+        """
+        from oracc_columnar import export_corpus
+
+        export_corpus(self, filename)
+
+    def publish(self):
+        """
+        Copies the token layers and catalogue metadata of the texts into
+        shared memory and returns them as an oracc_shared.SharedCorpus, which
+        process pool workers attach to instead of receiving a copy.
+        """
+        from oracc_shared import publish_corpus
+
+        return publish_corpus(self)
+
+    def ngrams(
+        self, n: int = 2, k: int = 25, layer: str = "norm"
+    ) -> List[Tuple[Tuple[str, ...], int]]:
+        """
+        The `k` most frequent n-grams of `layer`, counted within lines.
+        """
+        return self.term_matrix(layer).most_common_ngrams(n, k)
+
+    def collocations(
+        self,
+        word: str,
+        window: int = 5,
+        layer: str = "norm",
+        measure: str = "llr",
+        min_count: int = 2,
+        n: int = 25,
+        lines: bool = False,
+    ) -> List[Tuple[str, int, float]]:
+        """
+        The words most associated with `word` within `window` tokens of it
+        (in the same text, or line with `lines=True`), scored by
+        log-likelihood ("llr") or pointwise mutual information ("pmi").
+        """
+        return self.term_matrix(layer).collocations(
+            word, window, measure, min_count, n, lines
+        )
+
+    def bigram_collocations(
+        self, layer: str = "norm", measure: str = "llr", min_count: int = 2, n: int = 25
+    ) -> List[Tuple[Tuple[str, str], int, float]]:
+        return self.term_matrix(layer).bigram_collocations(measure, min_count, n)
+
+    def get_index(self, layer: str = "norm") -> TokenIndex:
+        """
+        Returns the token index for `layer`, building it over every loaded
+        text on first use (filtering only narrows down the hits).
+        """
+        index = self.indexes.get(layer)
+        if index is None:
+            index = self.indexes[layer] = TokenIndex(layer)
+            texts = self.alltexts if self.filtered else self.texts
+            for pnum, text in texts.items():
+                index.add_text(pnum, text.get_tokens(layer))
+        return index
+
+    def get_sign_index(self) -> SignIndex:
+        """
+        Returns the index of the signs of the transliterated words, building
+        it over every loaded text on first use (see SignIndex).
+        """
+        index = self.indexes.get("signs")
+        if index is None:
+            index = self.indexes["signs"] = SignIndex()
+            texts = self.alltexts if self.filtered else self.texts
+            for pnum, text in texts.items():
+                index.add_text(pnum, text.get_tokens(index.layer))
+        return index
+
+    def sign_hits(self, query: str) -> List[Tuple[str, int, int]]:
+        hits = [
+            hit for hit in self.get_sign_index().search(query) if hit[0] in self.texts
+        ]
+        order = self.order
+        return sorted(hits, key=lambda hit: (order[hit[0]], hit[1]))
+
+    def sign_search(self, query: str) -> List[Tuple[str, str, List[str]]]:
+        """
+        Finds sign sequences in the transliteration, also inside words and
+        around breaks: "šar-ru" finds šar-ru-ti and [šar]-ru, "{d}AG-*" the
+        names starting with Nabû, "*ru*" every sign holding "ru" (see
+        SignIndex.search).
+        :return: the pnum, line label and transliterated words of each hit.
+        """
+        results = []
+        for pnum, i, length in self.sign_hits(query):
+            layers = self.texts[pnum].get_layers()
+            results.append(
+                (pnum, layers.label("frag", i), layers.tokens("frag", i, i + length))
+            )
+        return results
+
+    def pprint_sign_search(self, query: str) -> None:
+        hits = self.sign_search(query)
+        print(f"Signs {query}: {len(hits)} hits")
+        print(f"{'-'*(16+len(query))}")
+        for pnum, label, words in hits:
+            print(f"{pnum} {label}: {' '.join(words)}")
+
+    def kwic_hits(
+        self, word: str, layer: str = "norm", prefix: bool = False
+    ) -> List[Tuple[str, int, int]]:
+        words = word.split() if isinstance(word, str) else list(word)
+        return [
+            (pnum, i, len(words))
+            for pnum, i in self.get_index(layer).search(words, prefix)
+            if pnum in self.texts
+        ]
+
+    def kwic(
+        self, word: str, window: int = 2, layer: str = "norm", prefix: bool = False
+    ):
+        """
+        Keyword in context. `word` may hold several words separated by spaces
+        (or be a list of words) to look for a phrase; with `prefix=True` every
+        word matches the tokens that start with it.
+        """
         lines = []
-        for text in self.texts:
-            norm = self.texts[text].get_norm()
-            idxs = [i for i, x in enumerate(norm) if x == word]
-            for i in idxs:
-                start = i - window if i > window else 0
-                end = i + window + 1
-                lines.append(norm[start:end])
+        for pnum, i, length in self.kwic_hits(word, layer, prefix):
+            start = i - window if i > window else 0
+            end = i + length + window
+            lines.append(self.texts[pnum].get_tokens(layer, start, end))
         return lines
 
-    def pprint_kwic(self, word: str, window: int = 2) -> None:
+    def pprint_kwic(
+        self, word: str, window: int = 2, layer: str = "norm", prefix: bool = False
+    ) -> None:
+        words = word.split() if isinstance(word, str) else list(word)
+
+        def match(w: str) -> bool:
+            return any(w.startswith(x) if prefix else w == x for x in words)
+
         lines = [
-            [f"[[{w}]]" if w == word else w for w in line]
-            for line in self.kwic(word, window)
+            [f"[[{w}]]" if match(w) else w for w in line]
+            for line in self.kwic(word, window, layer, prefix)
         ]
+        word = " ".join(words)
         print(f"KWIC for {word}:")
         print(f"{'-'*(10+len(word))}")
         for line in lines:
             print(" ".join(line))
 
+    def in_corpus_order(self, pnums: Iterable[str]) -> List[str]:
+        # costs time in the number of pnums, not in the size of the corpus
+        order = self.order
+        return sorted((pnum for pnum in set(pnums) if pnum in order), key=order.get)
+
     def filter(self, selected_texts: List[str]) -> None:
         if self.filtered:
             print("Already filtered, please .unfilter() first.")
         else:
             self.filtered = True
-            self.alltexts = copy.deepcopy(self.texts)
+            # the text objects are shared, nothing is copied
+            self.alltexts = self.texts
             self.texts = {
-                pnum: self.texts[pnum] for pnum in self.texts if pnum in selected_texts
+                pnum: self.alltexts[pnum]
+                for pnum in self.in_corpus_order(selected_texts)
+                if pnum in self.alltexts
             }
+            self.matrices = {}
 
     def unfilter(self):
         if not self.filtered:
             print("Not filtered, has no effect")
         else:
             self.filtered = False
-            self.texts = copy.deepcopy(self.alltexts)
+            self.texts = self.alltexts
+            self.matrices = {}
+
+    def select(
+        self, pnums: Optional[Iterable[str]] = None, **fields: Any
+    ) -> "ORACC_CorpusView":
+        """
+        Returns a view on the texts that are in `pnums` (if given) and whose
+        catalogue metadata matches every keyword, e.g.
+        `select(author="Balasî", genre="letter")`. A keyword may also be given
+        a set of accepted values. `author` stands for "ancient_author".
+        Views share the text objects of the corpus and can be selected from
+        again.
+        """
+        if fields:
+            fields = {
+                "ancient_author" if field == "author" else field: value
+                for field, value in fields.items()
+            }
+            matches = self.metadata_index.search(**fields)
+            if pnums is not None:
+                matches.intersection_update(pnums)
+            keys = [
+                pnum for pnum in self.in_corpus_order(matches) if pnum in self.texts
+            ]
+        elif pnums is not None:
+            keys = [pnum for pnum in self.in_corpus_order(pnums) if pnum in self.texts]
+        else:
+            keys = list(self.texts)
+        return ORACC_CorpusView(self, {pnum: self.texts[pnum] for pnum in keys})
+
+    def lookup(self, field: str, value: Any) -> List[str]:
+        """
+        The texts whose catalogue `field` has `value`, in corpus order.
+        """
+        return [
+            pnum
+            for pnum in self.in_corpus_order(self.metadata_index.lookup(field, value))
+            if pnum in self.texts
+        ]
+
+    def value_counts(self, field: str) -> Dict[Any, int]:
+        """
+        The number of texts per value of a catalogue field.
+        """
+        values = self.metadata_index.field(field)
+        if len(self.texts) == len(self.metadata_index):
+            return {value: len(keys) for value, keys in values.items()}
+        counts = {}
+        for value, keys in values.items():
+            count = sum(1 for key in keys if key in self.texts)
+            if count:
+                counts[value] = count
+        return counts
 
     def toc_by_author(self) -> None:
-        authors = {}
-        for text in self.texts:
-            author = self.texts[text].ancient_author
-            authors.setdefault(author, []).append(text)
-        max_len = len(max(authors.keys(), key=len)) + 3
+        authors = self.value_counts("ancient_author")
         print("ToC by Author:")
         print("--------------")
-        max_len = len(max(authors.keys(), key=len)) + 3
-        for [i, (author, texts)] in enumerate(
-            sorted(authors.items(), key=lambda x: len(x[1]), reverse=True)
+        max_len = len(max(authors.keys(), key=len, default="")) + 3
+        for [i, (author, count)] in enumerate(
+            sorted(authors.items(), key=lambda x: x[1], reverse=True)
         ):
             au_len = len(author) - max_len + 1
             spc = int(max_len / 2)
             if i % 5 == 0 and i > 0:
                 print(f"{'- '*spc}")
-            print(f"{author}:{len(texts):>{au_len}}")
+            print(f"{author}:{count:>{au_len}}")
 
     def get_texts_by_author(self, author: str):
-        return [
-            text for text in self.texts if self.texts[text].ancient_author == author
-        ]
+        return self.lookup("ancient_author", author)
+
+
+class ORACC_CorpusView(ORACC_Corpus):
+    """
+    This class represent a selection of texts from an ORACC_Corpus (see
+    ORACC_Corpus.select). It shares the text objects and token indexes of the
+    corpus it was selected from, so creating one costs time in the number of
+    selected texts only. Views can be narrowed down further with select and
+    combined with & and |.
+    """
+
+    def __init__(self, parent: ORACC_Corpus, texts: Dict[str, ORACC_Text]) -> None:
+        self.parent: ORACC_Corpus = parent
+        self.corpus: ORACC_Corpus = getattr(parent, "corpus", parent)
+        self.dir = parent.dir
+        self.source = parent.source
+        self.catalog_file = parent.catalog_file
+        self.metadata_file = parent.metadata_file
+        self.corpus_file = parent.corpus_file
+        self.name = parent.name
+        self.blurb = parent.blurb
+        self.pathname = parent.pathname
+        self.workers = parent.workers
+        self.threads = parent.threads
+        self.lazy = parent.lazy
+        self.vocab = parent.vocab
+        self.keep_json = parent.keep_json
+        self.executor = None
+        self.cache = None
+        self.texts = texts
+        self.filtered = False
+        self.order = self.corpus.order
+        self.indexes = self.corpus.indexes
+        self.matrices = {}
+        self.metadata_index = self.corpus.metadata_index
+
+    def load_corpus(self) -> None:
+        raise TypeError("A view cannot be loaded, load the corpus it came from.")
+
+    def refresh(self) -> Dict[str, List[str]]:
+        raise TypeError("A view cannot be refreshed, refresh the corpus it came from.")
+
+    def get_index(self, layer: str = "norm") -> TokenIndex:
+        return self.corpus.get_index(layer)
+
+    def get_sign_index(self) -> SignIndex:
+        return self.corpus.get_sign_index()
+
+    def kwic_hits(
+        self, word: str, layer: str = "norm", prefix: bool = False
+    ) -> List[Tuple[str, int, int]]:
+        return self.current(super().kwic_hits(word, layer, prefix))
+
+    def sign_hits(self, query: str) -> List[Tuple[str, int, int]]:
+        return self.current(super().sign_hits(query))
+
+    def current(self, hits: List[Tuple[str, int, int]]) -> List[Tuple[str, int, int]]:
+        # the shared indexes follow the corpus: hits in texts that a refresh
+        # replaced since the view was selected point into the new text
+        corpus = self.corpus
+        texts = corpus.alltexts if corpus.filtered else corpus.texts
+        return [hit for hit in hits if texts.get(hit[0]) is self.texts[hit[0]]]
+
+    def __and__(self, other: "ORACC_CorpusView") -> "ORACC_CorpusView":
+        return ORACC_CorpusView(
+            self.corpus,
+            {pnum: text for pnum, text in self.texts.items() if pnum in other.texts},
+        )
 
+    def __or__(self, other: "ORACC_CorpusView") -> "ORACC_CorpusView":
+        pnums = self.in_corpus_order(list(self.texts) + list(other.texts))
+        texts = {**other.texts, **self.texts}
+        return ORACC_CorpusView(self.corpus, {pnum: texts[pnum] for pnum in pnums})
@@ -0,0 +1,143 @@
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from oracc_reader import decode
+
+ORACC_URL = "http://oracc.org"
+
+
+def parse_translation(html: bytes) -> List[str]:
+    """
+    Pulls the translation paragraphs out of an ORACC text page. The page is
+    parsed once, from its bytes: ORACC serves UTF-8 without saying so in its
+    headers, which is what made the decoded text look like Windows-1252.
+    """
+    soup = BeautifulSoup(html, "html.parser", from_encoding="utf-8")
+    # TODO: add line detection
+    # you just need to p.find(class_='xtr-label').get_text()
+    return [p.get_text() for p in soup.find_all("p", class_="tr")]
+
+
+class Fetcher:
+    """
+    This class fetches ORACC pages and API json over one pooled HTTP session,
+    with a timeout and retries with backoff on connection errors and 429/5xx
+    responses.
+    With a `cache_dir`, every response body is kept on disk (for `max_age`
+    seconds, or for good if that is None) and served from there afterwards.
+    Batches are fetched on up to `workers` threads at a time.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        timeout: float = 30.0,
+        retries: int = 3,
+        workers: int = 8,
+        max_age: Optional[float] = None,
+        base_url: str = ORACC_URL,
+    ):
+        self.cache_dir: Optional[Path] = Path(cache_dir) if cache_dir else None
+        self.timeout: float = timeout
+        self.workers: int = workers
+        self.max_age: Optional[float] = max_age
+        self.base_url: str = base_url.rstrip("/")
+        self.errors: Dict[str, Exception] = {}
+        self.session = requests.Session()
+        retry = Retry(
+            total=retries,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=("GET",),
+        )
+        adapter = HTTPAdapter(
+            pool_connections=workers, pool_maxsize=workers, max_retries=retry
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def cached(self, url: str) -> Optional[Path]:
+        if self.cache_dir is None:
+            return None
+        digest = hashlib.sha1(url.encode("utf8")).hexdigest()
+        return self.cache_dir / digest[:2] / digest
+
+    def get(self, url: str) -> bytes:
+        """
+        The body of `url`, from the cache if it is there and fresh enough.
+        """
+        path = self.cached(url)
+        if path is not None and path.exists():
+            if (
+                self.max_age is None
+                or time.time() - path.stat().st_mtime < self.max_age
+            ):
+                return path.read_bytes()
+        r = self.session.get(url, timeout=self.timeout)
+        r.raise_for_status()
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            tmp.write_bytes(r.content)
+            os.replace(tmp, path)
+        return r.content
+
+    def get_many(self, urls: Iterable[str]) -> Dict[str, bytes]:
+        """
+        Fetches `urls` concurrently. Failed urls are left out of the result
+        and their exception is kept in `errors`.
+        """
+        urls = list(dict.fromkeys(urls))
+        results: Dict[str, bytes] = {}
+
+        def fetch(url: str) -> None:
+            try:
+                results[url] = self.get(url)
+            except (requests.RequestException, OSError) as e:
+                self.errors[url] = e
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            list(pool.map(fetch, urls))
+        return {url: results[url] for url in urls if url in results}
+
+    def get_json(self, url: str) -> Dict[str, Any]:
+        return decode(self.get(url))
+
+    def translation_url(self, project: str, pnum: str) -> str:
+        return f"{self.base_url}/{project}/{pnum}"
+
+    def translation(self, project: str, pnum: str) -> List[str]:
+        return parse_translation(self.get(self.translation_url(project, pnum)))
+
+    def translations(self, project: str, pnums: Iterable[str]) -> Dict[str, List[str]]:
+        """
+        The translations of many texts of a project, fetched concurrently.
+        Texts whose page could not be fetched are left out (see `errors`).
+        """
+        urls = {pnum: self.translation_url(project, pnum) for pnum in pnums}
+        pages = self.get_many(urls.values())
+        return {
+            pnum: parse_translation(pages[url])
+            for pnum, url in urls.items()
+            if url in pages
+        }
+
+
+DEFAULT_FETCHER: Optional[Fetcher] = None
+
+
+def default_fetcher() -> Fetcher:
+    # shared, so that separate calls still reuse the same connections
+    global DEFAULT_FETCHER
+    if DEFAULT_FETCHER is None:
+        DEFAULT_FETCHER = Fetcher()
+    return DEFAULT_FETCHER
@@ -15,8 +15,15 @@ or otherwise downloaded from ORACC's GitHub:
 
 import json
 import os
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from fnmatch import fnmatch
+from functools import partial
 from zipfile import ZipFile
 
+import oracc_profile
+
 __author__ = ['Andrew Deloucas <ADeloucas@g.harvard.com>']
 __license__ = 'MIT License. See LICENSE.'
 
@@ -38,27 +45,167 @@ class ORACCUnzip(object):  # pylint: disable=too-few-public-methods
         self.zip = []
         self.target_directory = target_directory
 
-    def unzip(self):
+    def unzip(self, workers=None, projects=None, members=None, incremental=True):
         """
-        This function unzips your documents.
-        :return: A folder with all the .json documents unzipped.
+        This function unzips your documents. Archives are extracted side by
+        side on a pool of threads, without changing the working directory.
+        :param workers: number of archives extracted at once (default: one per CPU).
+        :param projects: only extract these projects, e.g. ['rinap', 'saao/saa10'].
+        :param members: only extract files matching these patterns, relative to
+                        their project, e.g. ['catalogue.json', 'metadata.json',
+                        'corpusjson/*'].
+        :param incremental: skip files whose size and CRC already match the
+                            copy on disk.
+        :return: A folder with all the .json documents unzipped; the number of
+                 files extracted and skipped is kept in self.summary.
         """
+        archives = []
         for f in os.walk(self.folder):  # pylint: disable=invalid-name
             for x in f[2]:  # pylint: disable=invalid-name
                 if x.endswith('.zip'):
                     self.zip.append(x)
-        cwd = os.getcwd()
-        os.chdir(self.folder)
-        for file in self.zip:
-            with ZipFile(file, 'r') as zip_obj:
-                try:
-                    os.mkdir('ORACC-Files')
-                    destination = os.path.join(self.target_directory, 'ORACC-Files')
-                    zip_obj.extractall(destination)
-                except FileExistsError:
-                    destination = os.path.join(self.target_directory, 'ORACC-Files')
-                    zip_obj.extractall(destination)
-        os.chdir(cwd)
+                    archives.append(os.path.join(f[0], x))
+        destination = os.path.join(self.target_directory, 'ORACC-Files')
+        os.makedirs(destination, exist_ok=True)
+        self.summary = {'extracted': 0, 'skipped': 0}  # pylint: disable= attribute-defined-outside-init
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            jobs = [pool.submit(extract_archive, archive, destination,
+                                projects, members, incremental)
+                    for archive in archives]
+            for job in jobs:
+                extracted, skipped = job.result()
+                self.summary['extracted'] += extracted
+                self.summary['skipped'] += skipped
+
+
+def wanted(name, projects=None, members=None):
+    """
+    Checks whether an archive member belongs to one of the projects and
+    matches one of the member patterns (either may be None for all).
+    :param name: path of the member inside the archive.
+    :return: True or False.
+    """
+    if name.endswith('/'):
+        return False
+    if projects is not None:
+        if not any(name.startswith(project.strip('/') + '/') for project in projects):
+            return False
+    if members is not None:
+        if not any(fnmatch(name, pattern) or fnmatch(name, '*/' + pattern)
+                   for pattern in members):
+            return False
+    return True
+
+
+def unchanged(info, path):
+    """
+    Checks whether the file at path already holds the archive member info.
+    The size is compared first, so the CRC is only computed for likely copies.
+    :return: True or False.
+    """
+    try:
+        if os.path.getsize(path) != info.file_size:
+            return False
+    except OSError:
+        return False
+    crc = 0
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            crc = zlib.crc32(block, crc)
+    return crc == info.CRC
+
+
+def extract_archive(archive, destination, projects=None, members=None, incremental=True):
+    """
+    Extracts one ORACC archive; see ORACCUnzip.unzip for the parameters.
+    :return: (number of files extracted, number of files skipped).
+    """
+    profile = oracc_profile.PROFILE
+    if profile is not None:
+        start = time.perf_counter()
+    extracted = 0
+    skipped = 0
+    size = 0
+    with ZipFile(archive, 'r') as zip_obj:
+        for info in zip_obj.infolist():
+            if not wanted(info.filename, projects, members):
+                continue
+            if incremental and unchanged(info, os.path.join(destination, info.filename)):
+                skipped += 1
+                continue
+            zip_obj.extract(info, destination)
+            extracted += 1
+            size += info.file_size
+    if profile is not None:
+        profile.record('unzip', time.perf_counter() - start, size, extracted,
+                       project=os.path.basename(archive))
+    return extracted, skipped
+
+
+def read_text_file(path):
+    """
+    Reads and parses one corpusjson file. Kept at module level so that it can
+    run on a process pool.
+    :param path: path of the .json file.
+    :return: (failure, data): failure is None, 'empty' or 'decode_error'.
+    """
+    profile = oracc_profile.PROFILE
+    if profile is not None:
+        start = time.perf_counter()
+    with open(path, 'rb') as f_i:
+        raw = f_i.read()
+    if profile is not None:
+        profile.record('read', time.perf_counter() - start, len(raw))
+    if not raw.strip():
+        return 'empty', None
+    if profile is not None:
+        start = time.perf_counter()
+    try:
+        data = json.loads(raw.decode('utf8'))
+    except ValueError:  # JSONDecodeError and UnicodeDecodeError alike
+        return 'decode_error', None
+    if profile is not None:
+        profile.record('decode', time.perf_counter() - start, len(raw))
+    return None, data
+
+
+class LoadReport(object):
+    """
+    This class collects the outcome of FileImport.load_corpus: the files that
+    were loaded, and the ones that failed, by reason:
+        empty: the file has no content (Text Fail 1).
+        decode_error: the file is not valid json.
+        missing_key: the text is not in the catalogue (Text Fail 2); these
+                     are listed by textid.
+        ignored: the file is not a .json file.
+    """
+    def __init__(self):
+        self.loaded = []
+        self.empty = []
+        self.decode_error = []
+        self.missing_key = []
+        self.ignored = []
+
+    def counts(self):
+        """
+        :return: the number of files per outcome.
+        """
+        return {'loaded': len(self.loaded),
+                'empty': len(self.empty),
+                'decode_error': len(self.decode_error),
+                'missing_key': len(self.missing_key),
+                'ignored': len(self.ignored)}
+
+    def failures(self):
+        """
+        :return: the number of files that could not be loaded.
+        """
+        return len(self.empty) + len(self.decode_error) + len(self.missing_key)
+
+    def __str__(self):
+        return '{loaded} texts loaded; {empty} empty, {decode_error} not valid json, ' \
+               '{missing_key} missing from the catalogue, {ignored} ignored.'. \
+               format(**self.counts())
 
 
 class FileImport(object):
@@ -72,11 +219,11 @@ class FileImport(object):
         2) Similarly, aemw/alalakh/idrimi, armep, cmawro, nimrud, oimea, qcat,
            and xcat appear to be missing textual information as a whole.
         3) Within other corpora, there appear to be missing textual information
-           as well, though on a lesser scale. These texts are printing out
-           as issues occur.
-        4) Load_corpus has two unknown bugs:
-            1) 127-140: Some texts run KeyErrors, and I don't know why.
-            2) 148-152: Some json files for particular texts are empty.
+           as well, though on a lesser scale. These texts are collected in
+           the LoadReport of load_corpus.
+        4) Load_corpus has two known failures:
+            1) Some texts are missing from the catalogue (KeyError).
+            2) Some json files for particular texts are empty.
     """
     def __init__(self, filename):
         """
@@ -93,68 +240,98 @@ class FileImport(object):
         Does not work for full series (e.g. saao/saa01 works, but not just saao/).
         """
         if self.filename.endswith('catalogue.json'):
-            with open(self.filename, encoding="utf8") as json_file:
-                self.filedata = json.load(json_file)  # pylint: disable= attribute-defined-outside-init
-                self.message = 'Catalogue is ready.'  # pylint: disable= attribute-defined-outside-init
+            with oracc_profile.stage('catalogue', project=self.project()):
+                with open(self.filename, encoding="utf8") as json_file:
+                    self.filedata = json.load(json_file)  # pylint: disable= attribute-defined-outside-init
+            self.message = 'Catalogue is ready.'  # pylint: disable= attribute-defined-outside-init
         else:
             self.message = 'File must be catalogue.json.'  # pylint: disable= attribute-defined-outside-init
         print(self.message)
 
-    def load_corpus(self):
+    def load_corpus(self, workers=None):
         """
         Loads 'corpusjson' folder associated into catalogue for future calling.
+        Files are read in this process, unless 'workers' asks for a pool of
+        more than one process (the calling script then needs an
+        if __name__ == '__main__' guard). Nothing is printed per file:
+        failures are collected in self.report (see LoadReport) and summed up
+        once at the end.
         :return: added dictionary value in .catalogue file containing json file
         information.
         """
+        profile = oracc_profile.PROFILE
+        if profile is not None:
+            start = time.perf_counter()
         self.read_corpus = []                          # pylint: disable= attribute-defined-outside-init
+        self.report = LoadReport()                     # pylint: disable= attribute-defined-outside-init
         pathway = os.path.split(self.filename)
         self.catalog = sorted(os.listdir(pathway[0]))  # pylint: disable= attribute-defined-outside-init
-        for file in self.catalog:
-            if not file == 'corpusjson':
-                pass
+        if 'corpusjson' in self.catalog:
+            corpus = os.path.join(pathway[0], 'corpusjson')
+            files = []
+            for ind_text in sorted(os.listdir(corpus)):
+                if ind_text.endswith('.json'):
+                    files.append(ind_text)
+                else:
+                    self.report.ignored.append(ind_text)
+            paths = [os.path.join(corpus, ind_text) for ind_text in files]
+            reader = read_text_file
+            if profile is not None:
+                # the workers report what they read back to this process
+                reader = partial(oracc_profile.collect, read_text_file, os.getpid(),
+                                 self.project())
+            if workers is not None and workers > 1 and len(paths) > 1:
+                chunksize = max(1, len(paths) // (workers * 4))
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    results = list(pool.map(reader, paths, chunksize=chunksize))
             else:
-                corpus = os.path.join(pathway[0], 'corpusjson')
-                os.chdir(corpus)
-                for ind_text in os.listdir(corpus):
-                    if ind_text.endswith('.json'):
-                        f_i = open(ind_text, encoding="utf8")
-                        try:
-                            data = json.load(f_i)
-                            #
-                            # There are a handful of texts that don't seem to work
-                            # in the following folders, e.g.:
-                            #
-                            #      blms: Q003094, Q003097, Q003098, Q003099, Q003102,
-                            #            Q003120, Q003122, Q003152 (8/1798 texts)
-                            #      riao: P465673, X000123, X029979 (3/885 texts)
-                            #   rimanum: P405202, P405400, P405406 (3/375 texts)
-                            #     dcclt: P256059, X000101 (2/9211 texts)
-                            #       1 each for rinap/sources, /scores, saao/saa04,
-                            #                  /saa05, /saa08, /saa15, /saa18
-                            #
-                            # This except line allows the program to continue running
-                            # outside of these edge cases. I have no idea why these
-                            # KeyErrors have formed.
-                            #
-                            try:
-                                self.filedata['members'][data['textid']].update({'text_file': data})
-                                self.read_corpus.append(ind_text.split('.')[0])
-                                # print('{x} has been loaded!'.format(x=ind_text))
-                            except KeyError:
-                                print('error loading {x}; reason unknown! '
-                                      '(Text Fail 2)'.format(x=data['textid']))
-                        #
-                        # Some folders have empty json files, which disrupt
-                        # the program; this exempts those files. They are not
-                        # to be seen in the print_catalogue.
-                        #
-                        except json.decoder.JSONDecodeError:
-                            print('{call_number} does not have information, '
-                                  'did not load. (Text Fail 1)'. \
-                                  format(call_number=ind_text))
-                        f_i.close()
-                    else:
-                        print('{x} is not .json file; ignored.'.format(x=ind_text))
+                results = [reader(path) for path in paths]
+            if profile is not None:
+                for _, stats in results:
+                    if stats:
+                        profile.merge(stats)
+                results = [result for result, _ in results]
+            for ind_text, (failure, data) in zip(files, results):
+                if failure is not None:
+                    #
+                    # Some folders have empty json files, which disrupt
+                    # the program; this exempts those files. They are not
+                    # to be seen in the print_catalogue.
+                    #
+                    getattr(self.report, failure).append(ind_text)
+                    continue
+                #
+                # There are a handful of texts that don't seem to work
+                # in the following folders, e.g.:
+                #
+                #      blms: Q003094, Q003097, Q003098, Q003099, Q003102,
+                #            Q003120, Q003122, Q003152 (8/1798 texts)
+                #      riao: P465673, X000123, X029979 (3/885 texts)
+                #   rimanum: P405202, P405400, P405406 (3/375 texts)
+                #     dcclt: P256059, X000101 (2/9211 texts)
+                #       1 each for rinap/sources, /scores, saao/saa04,
+                #                  /saa05, /saa08, /saa15, /saa18
+                #
+                # Their textid is missing from the catalogue; they are
+                # reported as such and skipped.
+                #
+                try:
+                    self.filedata['members'][data['textid']].update({'text_file': data})
+                    self.read_corpus.append(ind_text.split('.')[0])
+                    self.report.loaded.append(ind_text)
+                except KeyError:
+                    self.report.missing_key.append(data.get('textid', ind_text))
+        if profile is not None:
+            profile.record('load_corpus', time.perf_counter() - start,
+                           texts=len(self.report.loaded), failures=self.report.failures(),
+                           project=self.project())
+        print(self.report)
+
+    def project(self):
+        """
+        :return: the directory of the catalogue, which names the project in profiles.
+        """
+        return os.path.dirname(os.path.abspath(self.filename))
 
     def print_catalogue(self):
         """
@@ -0,0 +1,340 @@
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from fnmatch import fnmatchcase
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from oracc_text import Vocabulary, split_signs
+
+# the marks split_signs drops, but for the * of a search pattern
+QUERY_MARKS = re.compile(r"[\[\]⸢⸣˹˺<>«»#?!]")
+
+
+class TokenIndex:
+    """
+    This class is an inverted index over one token layer ("norm" or
+    "translit") of a corpus: every token maps to the texts it occurs in and
+    its positions there. Texts can be added and removed one at a time, so
+    the index can grow as texts are loaded.
+    """
+
+    def __init__(self, layer: str = "norm"):
+        self.layer: str = layer
+        self.postings: Dict[str, Dict[str, List[int]]] = {}
+        # insertion order of the texts, so hits come back in corpus order
+        self.order: Dict[str, int] = {}
+        self.counter: int = 0
+        self.vocabulary: List[str] = []
+        self.sorted: bool = True
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.order
+
+    def add_text(self, key: str, tokens: Sequence[str]) -> None:
+        # a text that is already indexed has to be removed first
+        self.order[key] = self.counter
+        self.counter += 1
+        for i, token in enumerate(tokens):
+            texts = self.postings.get(token)
+            if texts is None:
+                texts = self.postings[token] = {}
+                self.sorted = False
+            texts.setdefault(key, []).append(i)
+
+    def remove_text(self, key: str, tokens: Optional[Iterable[str]] = None) -> None:
+        """
+        Drops a text from the index. Without its `tokens` (e.g. when the text
+        has been unloaded since) every posting list is looked at instead.
+        """
+        if self.order.pop(key, None) is None:
+            return
+        for token in set(tokens) if tokens is not None else list(self.postings):
+            texts = self.postings.get(token)
+            if texts is not None:
+                texts.pop(key, None)
+                if not texts:
+                    del self.postings[token]
+                    self.sorted = False
+
+    def renumber(self, order: Dict[str, int]) -> None:
+        """
+        Takes over the positions of the texts in `order`, e.g. after texts
+        were added to the middle of a corpus.
+        """
+        for key in self.order:
+            self.order[key] = order[key]
+        self.counter = max(self.order.values(), default=-1) + 1
+
+    def words(self, prefix: str) -> List[str]:
+        """
+        All indexed tokens starting with `prefix`, found by bisecting the
+        sorted vocabulary.
+        """
+        if not self.sorted:
+            self.vocabulary = sorted(self.postings)
+            self.sorted = True
+        words = []
+        for word in self.vocabulary[bisect_left(self.vocabulary, prefix) :]:
+            if not word.startswith(prefix):
+                break
+            words.append(word)
+        return words
+
+    def lookup(self, word: str, prefix: bool = False) -> Dict[str, List[int]]:
+        if not prefix:
+            return self.postings.get(word, {})
+        merged: Dict[str, List[int]] = {}
+        for match in self.words(word):
+            for key, positions in self.postings[match].items():
+                merged.setdefault(key, []).extend(positions)
+        return merged
+
+    def search(
+        self, words: Sequence[str], prefix: bool = False
+    ) -> List[Tuple[str, int]]:
+        """
+        Finds every place where `words` occur one after the other and returns
+        them as (key, position of the first word), in corpus order.
+        """
+        if not words:
+            return []
+        postings = [self.lookup(word, prefix) for word in words]
+        keys = set(min(postings, key=len))
+        for texts in postings:
+            keys.intersection_update(texts)
+        hits = []
+        for key in keys:
+            following = [set(texts[key]) for texts in postings[1:]]
+            for i in postings[0][key]:
+                if all(i + n + 1 in positions for n, positions in enumerate(following)):
+                    hits.append((key, i))
+        hits.sort(key=lambda hit: (self.order[hit[0]], hit[1]))
+        return hits
+
+
+class SignIndex:
+    """
+    This class indexes the signs of the transliterated words ("frag" tokens)
+    of a corpus, for searching sign sequences inside words, broken ones
+    included (see oracc_text.split_signs).
+
+    The signs of all texts are kept in one stream of sign ids, with the word
+    each one belongs to (`words`); every sign and every pair of signs of a
+    word maps to its positions in the stream. A query is anchored on its
+    rarest sign or sign pair and the rest of it is checked against the
+    stream, so a search costs time in the number of anchor postings.
+    Removed texts are only marked as such; their signs stay in the stream.
+    """
+
+    layer = "translit"
+
+    def __init__(self):
+        self.signs: Vocabulary = Vocabulary()
+        self.stream: array = array("I")
+        self.words: array = array("I")
+        self.postings: Dict[int, array] = {}
+        self.pairs: Dict[Tuple[int, int], array] = {}
+        # first word of every text added, and the key it was added under
+        # (None once the text is removed)
+        self.starts: List[int] = []
+        self.keys: List[Optional[str]] = []
+        self.ordinals: Dict[str, int] = {}
+        self.word_count: int = 0
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.ordinals
+
+    def add_text(self, key: str, tokens: Sequence[str]) -> None:
+        # a text that is already indexed has to be removed first
+        self.ordinals[key] = len(self.keys)
+        self.keys.append(key)
+        self.starts.append(self.word_count)
+        sign_id = self.signs.id
+        for token in tokens:
+            previous = None
+            for sign in split_signs(token):
+                i = sign_id(sign)
+                position = len(self.stream)
+                self.stream.append(i)
+                self.words.append(self.word_count)
+                self.postings.setdefault(i, array("I")).append(position)
+                if previous is not None:
+                    pair = self.pairs.get((previous, i))
+                    if pair is None:
+                        pair = self.pairs[(previous, i)] = array("I")
+                    pair.append(position - 1)
+                previous = i
+            self.word_count += 1
+        # a gap, so that no sequence runs on into the next text
+        self.word_count += 1
+
+    def remove_text(self, key: str, tokens: Optional[Iterable[str]] = None) -> None:
+        ordinal = self.ordinals.pop(key, None)
+        if ordinal is not None:
+            self.keys[ordinal] = None
+
+    def renumber(self, order: Dict[str, int]) -> None:
+        # hits are put in corpus order by the corpus
+        pass
+
+    def matching(self, pattern: str) -> Optional[Set[int]]:
+        """
+        The ids of the signs matching `pattern`, in which * stands for any
+        characters; None for "*" itself, which matches every sign.
+        """
+        if pattern == "*":
+            return None
+        if "*" not in pattern:
+            i = self.signs.ids.get(pattern)
+            return {i} if i is not None else set()
+        return {
+            i for i, sign in enumerate(self.signs.tokens) if fnmatchcase(sign, pattern)
+        }
+
+    def search(self, query: str) -> List[Tuple[str, int, int]]:
+        """
+        Finds the places where the signs of `query` follow each other, e.g.
+        "šar-ru", "{d}AG-*" or "a-na LUGAL". Within a word the signs may sit
+        anywhere; the words of a query with several words have to follow
+        each other (the first ending and the last starting a word there).
+        In a sign, * stands for any characters ("*ru*"), and a sign "*" for
+        any one sign. Brackets and flags are ignored, "[...]" looks for a
+        break.
+        :return: (key, first word, number of words) per hit, each word once.
+        """
+        query_words = [split_signs(word, QUERY_MARKS) for word in query.split()]
+        patterns = []
+        for q, word in enumerate(query_words):
+            for pattern in word:
+                patterns.append((q, self.matching(pattern)))
+        if not patterns:
+            return []
+        anchors = []
+        for j, (q, ids) in enumerate(patterns):
+            if ids is not None:
+                postings = [self.postings.get(i, ()) for i in ids]
+                anchors.append((sum(len(p) for p in postings), j, postings))
+            if (
+                j > 0
+                and ids is not None
+                and len(ids) == 1
+                and patterns[j - 1][0] == q
+                and patterns[j - 1][1] is not None
+                and len(patterns[j - 1][1]) == 1
+            ):
+                pair = (next(iter(patterns[j - 1][1])), next(iter(ids)))
+                postings = [self.pairs.get(pair, ())]
+                anchors.append((len(postings[0]), j - 1, postings))
+        if not anchors:
+            raise ValueError("A query needs at least one sign that is not *.")
+        _, offset, postings = min(anchors, key=lambda anchor: anchor[0])
+        stream, words, length = self.stream, self.words, len(self.stream)
+        hits = set()
+        for posting in postings:
+            for position in posting:
+                start = position - offset
+                if start < 0 or start + len(patterns) > length:
+                    continue
+                word = words[start]
+                for j, (q, ids) in enumerate(patterns):
+                    if words[start + j] != word + q or (
+                        ids is not None and stream[start + j] not in ids
+                    ):
+                        break
+                else:
+                    hits.add(word)
+        results = []
+        for word in hits:
+            ordinal = bisect_right(self.starts, word) - 1
+            key = self.keys[ordinal]
+            if key is not None:
+                results.append((key, word - self.starts[ordinal], len(query_words)))
+        return results
+
+
+class MetadataIndex:
+    """
+    This class indexes the catalogue metadata of a corpus: for every field it
+    maps each value to the texts that have it, so texts can be looked up by
+    author, genre, period, provenience, ... without scanning the corpus.
+    A field is indexed over every text the first time it is asked for, and
+    kept up to date from then on as texts are added and removed. Texts that
+    lack a field are indexed under None.
+    """
+
+    def __init__(self):
+        self.metadata: Dict[str, Dict[str, Any]] = {}
+        # field -> value -> keys (a dict, so the keys keep their order)
+        self.fields: Dict[str, Dict[Any, Dict[str, None]]] = {}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.metadata
+
+    def __len__(self) -> int:
+        return len(self.metadata)
+
+    def add_text(self, key: str, metadata: Optional[Dict[str, Any]]) -> None:
+        if key in self.metadata:
+            self.remove_text(key)
+        metadata = metadata or {}
+        self.metadata[key] = metadata
+        for field, values in self.fields.items():
+            values.setdefault(hashable(metadata.get(field)), {})[key] = None
+
+    def remove_text(self, key: str) -> None:
+        metadata = self.metadata.pop(key, None)
+        if metadata is None:
+            return
+        for field, values in self.fields.items():
+            value = hashable(metadata.get(field))
+            keys = values.get(value)
+            if keys is not None:
+                keys.pop(key, None)
+                if not keys:
+                    del values[value]
+
+    def field(self, field: str) -> Dict[Any, Dict[str, None]]:
+        """
+        The value -> keys table of `field`, built on first use.
+        """
+        values = self.fields.get(field)
+        if values is None:
+            values = self.fields[field] = {}
+            for key, metadata in self.metadata.items():
+                values.setdefault(hashable(metadata.get(field)), {})[key] = None
+        return values
+
+    def lookup(self, field: str, value: Any) -> Dict[str, None]:
+        return self.field(field).get(hashable(value), {})
+
+    def search(self, **fields: Any) -> Set[str]:
+        """
+        The keys of the texts that match every keyword; a keyword may also be
+        given a set (or list or tuple) of accepted values.
+        """
+        matches: Optional[Set[str]] = None
+        # the most selective field first, so the intersections stay small
+        for keys in sorted(
+            (self.matching(field, value) for field, value in fields.items()), key=len
+        ):
+            matches = set(keys) if matches is None else matches & keys
+            if not matches:
+                break
+        return set(self.metadata) if matches is None else matches
+
+    def matching(self, field: str, value: Any) -> Set[str]:
+        if not isinstance(value, (set, frozenset, list, tuple)):
+            return set(self.lookup(field, value))
+        keys: Set[str] = set()
+        for v in value:
+            keys.update(self.lookup(field, v))
+        return keys
+
+
+def hashable(value: Any) -> Any:
+    # a few catalogue fields hold lists
+    if isinstance(value, list):
+        return tuple(hashable(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, hashable(v)) for k, v in value.items()))
+    return value
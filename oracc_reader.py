@@ -1,7 +1,63 @@
 import json as JSON
-from typing import Dict, Any
+import mmap
+import os
+import threading
+import time
+from pathlib import Path, PurePosixPath
+from typing import Callable, Dict, Any, Iterable, List, Optional, Sequence, Tuple
+from zipfile import ZipFile
 
-import requests
+import oracc_profile
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+# every decoder takes the raw bytes of a file, no str decoding in between
+DECODERS: Dict[str, Callable[[bytes], Any]] = {"json": JSON.loads}
+if ujson is not None:
+    DECODERS["ujson"] = ujson.loads
+if orjson is not None:
+    DECODERS["orjson"] = orjson.loads
+# the fastest one installed
+DEFAULT_DECODER: str = list(DECODERS)[-1]
+# decoders that can parse a memory map without copying it into bytes first
+BUFFER_DECODERS = {"orjson"}
+# files at least this big are memory-mapped rather than read
+MMAP_THRESHOLD: int = 32 * 1024 * 1024
+# the top-level keys the corpus classes use
+USED_KEYS: Tuple[str, ...] = ("textid", "cdl", "members", "config")
+
+
+def get_decoder(name: Optional[str] = None) -> Callable[[bytes], Any]:
+    if name is None:
+        name = DEFAULT_DECODER
+    if name not in DECODERS:
+        raise ValueError(f"Unknown or uninstalled json decoder: {name}")
+    return DECODERS[name]
+
+
+def decode(
+    raw, decoder: Optional[str] = None, keys: Optional[Sequence[str]] = None
+) -> Dict[str, Any]:
+    profile = oracc_profile.PROFILE
+    if profile is not None:
+        start = time.perf_counter()
+    name = decoder or DEFAULT_DECODER
+    if not isinstance(raw, bytes) and name not in BUFFER_DECODERS:
+        raw = bytes(raw)
+    data = get_decoder(name)(raw)
+    if keys is not None and isinstance(data, dict):
+        # the rest of the file is dropped right away instead of kept around
+        data = {key: data[key] for key in keys if key in data}
+    if profile is not None:
+        profile.record("decode", time.perf_counter() - start, bytes=len(raw))
+    return data
 
 
 class FileReader:
@@ -9,12 +65,52 @@ class FileReader:
     This class reads in a file object and converts it from json into a native
     python object.
     It should be identical in functionality to an API reader.
+
+    The file is read as bytes and handed to `decoder` (see DECODERS; by
+    default orjson or ujson if installed, else the json module). Files of
+    MMAP_THRESHOLD bytes or more are memory-mapped, unless `use_mmap` says
+    otherwise. `keys` keeps only those top-level keys, e.g. USED_KEYS.
     """
 
-    def __init__(self, filename: str):
+    def __init__(
+        self,
+        filename: str,
+        decoder: Optional[str] = None,
+        use_mmap: Optional[bool] = None,
+        keys: Optional[Sequence[str]] = None,
+    ):
         self.filename = filename
-        with open(self.filename) as f:
-            self.data: Dict[str, Any] = JSON.loads(f.read())
+        profile = oracc_profile.PROFILE
+        if profile is not None:
+            start = time.perf_counter()
+        with open(self.filename, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if use_mmap is None:
+                use_mmap = size >= MMAP_THRESHOLD
+            if use_mmap and size > 0:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                    if profile is not None:
+                        # pages are only read in while decoding
+                        profile.record("read", time.perf_counter() - start, size)
+                    with memoryview(m) as view:
+                        self.data: Dict[str, Any] = decode(view, decoder, keys)
+            else:
+                raw = f.read()
+                if profile is not None:
+                    profile.record("read", time.perf_counter() - start, size)
+                self.data = decode(raw, decoder, keys)
+
+
+class SourceReader:
+    """
+    This class reads in a json file from a project source (see DirectorySource
+    and ZipSource) and converts it into a native python object.
+    It should be identical in functionality to the file reader.
+    """
+
+    def __init__(self, source, name: str):
+        self.filename = name
+        self.data: Dict[str, Any] = source.read(name)
 
 
 class APIReader:
@@ -23,10 +119,137 @@ class APIReader:
     native python object.
     It should be identical in functionality to the file reader.
     The ORACC API is currently non-functional.
+    Requests go through `fetcher` (see oracc_fetch), by default one shared
+    pooled and retrying session.
     """
 
-    def __init__(self, url: str):
+    def __init__(self, url: str, fetcher=None):
+        from oracc_fetch import default_fetcher
+
         self.url = url
-        r = requests.get(url)
-        self.data: Dict[str, any] = JSON.loads(r.content)
-        # TODO: request and process url
+        fetcher = fetcher if fetcher is not None else default_fetcher()
+        self.data: Dict[str, Any] = fetcher.get_json(url)
+
+
+class DirectorySource:
+    """
+    This class reads the json files of an ORACC project that has been
+    extracted to disk. Names are relative to the project directory (absolute
+    paths are used as they are). `decoder` and `keys` are passed on to
+    FileReader.
+    """
+
+    def __init__(
+        self,
+        root: str = "",
+        decoder: Optional[str] = None,
+        keys: Optional[Sequence[str]] = None,
+    ):
+        self.root: Path = Path(root)
+        self.decoder: Optional[str] = decoder
+        self.keys: Optional[Sequence[str]] = keys
+
+    def read(self, name: str) -> Dict[str, Any]:
+        return FileReader(str(self.root / name), self.decoder, keys=self.keys).data
+
+    def locate(self, name: str) -> str:
+        return str((self.root / name).resolve())
+
+    def fingerprint(self, name: str) -> Tuple[int, int]:
+        stat = os.stat(self.root / name)
+        return (stat.st_mtime_ns, stat.st_size)
+
+
+def zip_projects(names: Iterable[str]) -> List[str]:
+    """
+    The ORACC projects (folders with a catalogue.json and a corpus.json) among
+    the member `names` of an archive, outermost first.
+    """
+    names = set(names)
+    projects = [
+        str(PurePosixPath(name).parent)
+        for name in names
+        if PurePosixPath(name).name == "catalogue.json"
+        and str(PurePosixPath(name).parent / "corpus.json") in names
+    ]
+    projects = ["" if project == "." else project for project in projects]
+    return sorted(projects, key=lambda x: (x.count("/") if x else -1, x))
+
+
+class ZipSource:
+    """
+    This class reads the json files of an ORACC project straight from a
+    downloaded project .zip, without extracting it.
+    ORACC zips keep the project path inside the archive (e.g.
+    saao/saa10/catalogue.json); `project` selects one of the projects in the
+    archive, by default the outermost one.
+    It should be identical in functionality to the directory source.
+    """
+
+    def __init__(
+        self,
+        archive: str,
+        project: Optional[str] = None,
+        decoder: Optional[str] = None,
+        keys: Optional[Sequence[str]] = None,
+    ):
+        self.archive: str = str(archive)
+        self.decoder: Optional[str] = decoder
+        self.keys: Optional[Sequence[str]] = keys
+        self.local = threading.local()
+        projects = self.projects()
+        if project is None:
+            if not projects:
+                raise FileNotFoundError(f"No ORACC project in {self.archive}")
+            project = projects[0]
+        elif project.strip("/") not in projects:
+            raise FileNotFoundError(f"No project {project} in {self.archive}")
+        self.project: str = project.strip("/")
+        self.prefix: str = f"{self.project}/" if self.project else ""
+
+    def zip(self) -> ZipFile:
+        # ZipFile handles are not safe to share between threads
+        handle = getattr(self.local, "handle", None)
+        if handle is None:
+            handle = self.local.handle = ZipFile(self.archive)
+        return handle
+
+    def projects(self) -> List[str]:
+        return zip_projects(self.zip().namelist())
+
+    def member(self, name: str) -> str:
+        name = str(name).replace(os.sep, "/")
+        while name.startswith("./"):
+            name = name[2:]
+        return self.prefix + name
+
+    def read(self, name: str) -> Dict[str, Any]:
+        profile = oracc_profile.PROFILE
+        if profile is not None:
+            start = time.perf_counter()
+        raw = self.zip().read(self.member(name))
+        if profile is not None:
+            profile.record("read", time.perf_counter() - start, len(raw))
+        return decode(raw, self.decoder, self.keys)
+
+    def locate(self, name: str) -> str:
+        return f"{os.path.abspath(self.archive)}!{self.member(name)}"
+
+    def fingerprint(self, name: str) -> Tuple[int, int]:
+        info = self.zip().getinfo(self.member(name))
+        return (info.CRC, info.file_size)
+
+    def close(self) -> None:
+        handle = getattr(self.local, "handle", None)
+        if handle is not None:
+            handle.close()
+            self.local.handle = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        del state["local"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self.local = threading.local()
@@ -0,0 +1,137 @@
+"""
+Corpora published in shared memory, for pools of analysis workers.
+
+    shared = publish_corpus(corpus)
+    with ProcessPoolExecutor() as pool:
+        pool.map(analyse, repeat(shared), words)
+    shared.unlink()
+
+The token layers and metadata are written once into a shared memory block,
+in the columnar layout of oracc_columnar. A SharedCorpus that is sent to a
+worker is not copied: the worker attaches to the block by its name and reads
+the layers from it, read-only.
+"""
+
+import io
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Optional
+
+from oracc_columnar import ColumnarCorpus, write_corpus
+from oracc_index import MetadataIndex
+from oracc_text import LAYERS
+
+
+class SharedBlock(SharedMemory):
+    """
+    This class is a shared memory block that may be garbage collected while
+    texts still point into it (e.g. when a worker process exits).
+    """
+
+    def __del__(self):
+        try:
+            self.close()
+        except (OSError, BufferError):
+            pass
+
+
+# corpora attached to in this process, by the name of their block
+ATTACHED: Dict[str, "SharedCorpus"] = {}
+
+
+def attach_memory(name: str) -> SharedBlock:
+    try:
+        return SharedBlock(name=name, track=False)
+    except TypeError:  # before Python 3.13
+        pass
+    # the resource tracker would unlink the block once this process is done
+    # with it, while the publisher and other workers still use it
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return SharedBlock(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def attach_corpus(name: str) -> "SharedCorpus":
+    """
+    The corpus published under `name`, attached to once per process.
+    """
+    corpus = ATTACHED.get(name)
+    if corpus is None:
+        corpus = ATTACHED[name] = SharedCorpus(name)
+    return corpus
+
+
+def publish_corpus(corpus, keys=LAYERS) -> "SharedCorpus":
+    """
+    Copies the layers of every text in `corpus` into a new shared memory
+    block and returns it as a SharedCorpus, which owns the block: call its
+    `unlink` once the workers are done.
+    """
+    buffer = io.BytesIO()
+    write_corpus(corpus, buffer, keys)
+    data = buffer.getbuffer()
+    memory = SharedBlock(create=True, size=max(len(data), 1))
+    memory.buf[: len(data)] = data
+    data.release()
+    shared = ATTACHED[memory.name] = SharedCorpus(memory.name, memory)
+    shared.owner = True
+    return shared
+
+
+class SharedCorpus(ColumnarCorpus):
+    """
+    This class represent a corpus whose token layers live in a shared memory
+    block (see publish_corpus). It is used like any ORACC_Corpus; pickled,
+    e.g. into a process pool, it travels as the name of its block and the
+    receiving process attaches to the block (once, see attach_corpus)
+    instead of copying the texts.
+    """
+
+    def __init__(self, name: str, memory: Optional[SharedBlock] = None) -> None:
+        self.memory: SharedBlock = memory if memory is not None else attach_memory(name)
+        self.owner: bool = False
+        super().__init__(name)
+
+    def load_corpus(self) -> None:
+        self.attach(self.memory.buf.toreadonly())
+
+    def location(self) -> str:
+        return f"shm:{self.filename}"
+
+    def close(self) -> None:
+        """
+        Detaches from the block. The texts read from it can no longer be used;
+        while views or texts still point into it, the mapping stays until
+        they are gone.
+        """
+        if ATTACHED.get(self.filename) is self:
+            del ATTACHED[self.filename]
+        self.texts = {}
+        self.indexes = {}
+        self.matrices = {}
+        self.metadata_index = MetadataIndex()
+        self.vocab = None
+        try:
+            self.memory.close()
+        except BufferError:
+            pass
+
+    def unlink(self) -> None:
+        """
+        Detaches from the block and frees it; only the publisher should call
+        this, once no worker needs the corpus any more.
+        """
+        try:
+            self.close()
+        finally:
+            if self.owner:
+                self.memory.unlink()
+
+    def refresh(self) -> Dict[str, List[str]]:
+        raise TypeError("A shared corpus cannot be refreshed, publish it again.")
+
+    def __reduce__(self):
+        return (attach_corpus, (self.filename,))
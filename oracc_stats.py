@@ -0,0 +1,314 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from oracc_text import LAYER_KEYS
+
+# catalogue fields kept alongside the rows of a document-term matrix
+FIELDS = ("ancient_author", "genre", "period")
+
+
+class DocumentTermMatrix:
+    """
+    This class is a sparse texts × terms count matrix over one token layer of
+    a corpus (see ORACC_Corpus.document_term_matrix), in CSR form: the
+    counts of row i are data[indptr[i]:indptr[i+1]], in the columns
+    indices[indptr[i]:indptr[i+1]].
+
+    `keys` and `metadata` (one array per catalogue field) are aligned with the
+    rows, `terms` with the columns. The whole token stream is kept as well
+    (`tokens` holds a column per token, `rows` its row and `lines` a number
+    that is shared by the tokens of one line), so that windows around words
+    and n-grams can be counted without going back to the texts.
+    """
+
+    def __init__(self, corpus, layer: str = "norm", fields: Sequence[str] = FIELDS):
+        self.layer: str = layer
+        self.keys: List[str] = list(corpus.texts)
+        texts = [corpus.texts[key] for key in self.keys]
+        self.metadata: Dict[str, np.ndarray] = {
+            field: np.array(
+                [(t.metadata or {}).get(field) for t in texts], dtype=object
+            )
+            for field in fields
+        }
+        ids = [np.frombuffer(t.get_ids(layer), dtype=np.uint32) for t in texts]
+        lengths = np.array([len(x) for x in ids], dtype=np.int64)
+        stream = np.concatenate(ids) if ids else np.zeros(0, dtype=np.uint32)
+        vocab_ids, self.tokens = np.unique(stream, return_inverse=True)
+        self.tokens = self.tokens.reshape(-1)
+        self.terms: List[str] = corpus.vocab.decode(vocab_ids.tolist())
+        self.columns: Dict[str, int] = {term: i for i, term in enumerate(self.terms)}
+        self.rows: np.ndarray = np.repeat(np.arange(len(texts)), lengths)
+        self.starts: np.ndarray = np.concatenate(([0], np.cumsum(lengths)))
+        # a new line starts at every text and at every line-start of a text
+        key = LAYER_KEYS[layer]
+        marks = [self.starts[:-1]] + [
+            start + np.frombuffer(t.get_layers().offsets[key], dtype=np.uint32)
+            for start, t in zip(self.starts[:-1].tolist(), texts)
+        ]
+        breaks = np.zeros(len(self.tokens) + 1, dtype=np.int64)
+        breaks[np.concatenate(marks).astype(np.int64)] = 1
+        self.lines: np.ndarray = np.cumsum(breaks)[: len(self.tokens)]
+        n_terms = len(self.terms)
+        cells, self.data = np.unique(
+            self.rows * n_terms + self.tokens, return_counts=True
+        )
+        self.indices: np.ndarray = cells % n_terms if n_terms else cells
+        self.indptr: np.ndarray = np.searchsorted(
+            cells // max(n_terms, 1), np.arange(len(texts) + 1)
+        )
+        self.shape: Tuple[int, int] = (len(texts), n_terms)
+
+    def to_scipy(self):
+        """
+        The matrix as a scipy.sparse.csr_matrix (scipy has to be installed).
+        """
+        from scipy.sparse import csr_matrix
+
+        return csr_matrix((self.data, self.indices, self.indptr), shape=self.shape)
+
+    def row_ids(self) -> np.ndarray:
+        # the row of every stored cell
+        return np.repeat(np.arange(self.shape[0]), np.diff(self.indptr))
+
+    def term_frequency(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Counts per term, over all texts or over a boolean mask of rows.
+        """
+        if rows is None:
+            return np.bincount(self.indices, weights=self.data, minlength=self.shape[1])
+        keep = rows[self.row_ids()]
+        return np.bincount(
+            self.indices[keep], weights=self.data[keep], minlength=self.shape[1]
+        )
+
+    def text_counts(self) -> np.ndarray:
+        """
+        Number of tokens per text.
+        """
+        return np.diff(self.starts)
+
+    def term_counts(self, term: str) -> np.ndarray:
+        """
+        How often `term` occurs in each text.
+        """
+        counts = np.zeros(self.shape[0], dtype=np.int64)
+        column = self.columns.get(term)
+        if column is not None:
+            cells = self.indices == column
+            counts[self.row_ids()[cells]] = self.data[cells]
+        return counts
+
+    def group_counts(self, field: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Sums the rows per value of a metadata field (e.g. per author).
+        :return: the values and a values × terms count matrix.
+        """
+        values, groups = np.unique(
+            self.metadata[field].astype(str), return_inverse=True
+        )
+        groups = groups.reshape(-1)
+        n_terms = self.shape[1]
+        counts = np.bincount(
+            groups[self.row_ids()] * n_terms + self.indices,
+            weights=self.data,
+            minlength=len(values) * n_terms,
+        ).reshape(len(values), n_terms)
+        return values, counts.astype(np.int64)
+
+    def mask(self, **fields) -> np.ndarray:
+        """
+        A boolean mask of the rows whose metadata matches every keyword.
+        """
+        rows = np.ones(self.shape[0], dtype=bool)
+        for field, value in fields.items():
+            rows &= self.metadata[field] == value
+        return rows
+
+    def frequency_table(
+        self, n: int = 25, rows: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, str, int, float, float]]:
+        """
+        The `n` most frequent terms as (rank, term, count, percent of all
+        tokens, running percent) rows, like the table in Sandbox.py.
+        """
+        counts = self.term_frequency(rows).astype(np.int64)
+        total = counts.sum()
+        # stable sort, so ties keep the order of the vocabulary
+        top = np.argsort(-counts, kind="stable")[:n]
+        percent = counts[top] * 100.0 / total if total else np.zeros(len(top))
+        running = np.cumsum(percent)
+        return [
+            (i + 1, self.terms[t], int(counts[t]), float(p), float(r))
+            for i, (t, p, r) in enumerate(zip(top, percent, running))
+        ]
+
+    def most_common(self, n: int = 25) -> List[Tuple[str, int]]:
+        return [(term, count) for _, term, count, _, _ in self.frequency_table(n)]
+
+    def occurrences(self, term: str) -> np.ndarray:
+        """
+        Positions of `term` in the token stream.
+        """
+        column = self.columns.get(term)
+        if column is None:
+            return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero(self.tokens == column)
+
+    def window(self, term: str, window: int = 5, lines: bool = False) -> np.ndarray:
+        """
+        Positions of the tokens up to `window` places before or after `term`,
+        within the same text (or the same line, with `lines=True`).
+        """
+        positions = self.occurrences(term)
+        shifts = np.concatenate((np.arange(-window, 0), np.arange(1, window + 1)))
+        around = (positions[:, None] + shifts[None, :]).reshape(-1)
+        origin = np.repeat(positions, len(shifts))
+        inside = (around >= 0) & (around < len(self.tokens))
+        around, origin = around[inside], origin[inside]
+        groups = self.lines if lines else self.rows
+        return around[groups[around] == groups[origin]]
+
+    def cooccurrence(
+        self, term: str, window: int = 5, lines: bool = False
+    ) -> np.ndarray:
+        """
+        Counts per term of the tokens up to `window` places before or after
+        `term`, within the same text (or line).
+        """
+        around = self.window(term, window, lines)
+        return np.bincount(self.tokens[around], minlength=self.shape[1])
+
+    def most_common_cooccurring(
+        self, term: str, window: int = 5, n: int = 25
+    ) -> List[Tuple[str, int]]:
+        counts = self.cooccurrence(term, window)
+        top = np.argsort(-counts, kind="stable")[:n]
+        return [(self.terms[t], int(counts[t])) for t in top if counts[t] > 0]
+
+    def collocations(
+        self,
+        term: str,
+        window: int = 5,
+        measure: str = "llr",
+        min_count: int = 2,
+        n: int = 25,
+        lines: bool = False,
+    ) -> List[Tuple[str, int, float]]:
+        """
+        The terms most strongly associated with `term` within `window` tokens
+        of it, as (term, count, score), best first. The window positions are
+        the sample: a term is expected there as often as its share of all
+        tokens. See association for the measures; terms seen less than
+        `min_count` times in the window are left out.
+        """
+        around = self.window(term, window, lines)
+        observed = np.bincount(self.tokens[around], minlength=self.shape[1])
+        totals = self.term_frequency()
+        keep = np.flatnonzero(observed >= max(min_count, 1))
+        scores = association(
+            observed[keep], len(around), totals[keep], len(self.tokens), measure
+        )
+        top = np.argsort(-scores, kind="stable")[:n]
+        return [
+            (self.terms[keep[i]], int(observed[keep[i]]), float(scores[i])) for i in top
+        ]
+
+    def ngrams(
+        self, n: int = 2, rows: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Counts the n-grams that lie within one line, over all texts or over a
+        boolean mask of rows.
+        :return: an (n-grams × n) array of columns and the count of each.
+        """
+        length = len(self.tokens) - n + 1
+        if length <= 0 or n < 1:
+            return np.zeros((0, max(n, 0)), dtype=np.int64), np.zeros(0, dtype=np.int64)
+        valid = self.lines[:length] == self.lines[n - 1 :]
+        if rows is not None:
+            valid &= rows[self.rows[:length]]
+        starts = np.flatnonzero(valid)
+        grams = np.stack([self.tokens[starts + i] for i in range(n)], axis=1)
+        size = max(self.shape[1], 1)
+        if size**n >= 2**63:
+            grams, counts = np.unique(grams, axis=0, return_counts=True)
+            return grams, counts
+        # one integer per n-gram is much faster to count than rows
+        powers = np.array([size ** (n - 1 - i) for i in range(n)], dtype=np.int64)
+        codes, counts = np.unique(grams @ powers, return_counts=True)
+        return (codes[:, None] // powers[None, :]) % size, counts
+
+    def most_common_ngrams(
+        self, n: int = 2, k: int = 25, rows: Optional[np.ndarray] = None
+    ) -> List[Tuple[Tuple[str, ...], int]]:
+        grams, counts = self.ngrams(n, rows)
+        top = np.argsort(-counts, kind="stable")[:k]
+        return [(tuple(self.terms[t] for t in grams[i]), int(counts[i])) for i in top]
+
+    def bigram_collocations(
+        self, measure: str = "llr", min_count: int = 2, n: int = 25
+    ) -> List[Tuple[Tuple[str, str], int, float]]:
+        """
+        The bigrams (within lines) whose words go together most strongly, as
+        ((first, second), count, score), best first.
+        """
+        grams, counts = self.ngrams(2)
+        first = np.bincount(grams[:, 0], weights=counts, minlength=self.shape[1])
+        second = np.bincount(grams[:, 1], weights=counts, minlength=self.shape[1])
+        keep = np.flatnonzero(counts >= max(min_count, 1))
+        scores = association(
+            counts[keep],
+            first[grams[keep, 0]],
+            second[grams[keep, 1]],
+            counts.sum(),
+            measure,
+        )
+        top = np.argsort(-scores, kind="stable")[:n]
+        return [
+            (
+                (self.terms[grams[keep[i], 0]], self.terms[grams[keep[i], 1]]),
+                int(counts[keep[i]]),
+                float(scores[i]),
+            )
+            for i in top
+        ]
+
+
+def association(
+    observed: np.ndarray,
+    node: np.ndarray,
+    collocate: np.ndarray,
+    total: int,
+    measure: str = "llr",
+) -> np.ndarray:
+    """
+    Association scores from the contingency tables of node and collocate:
+    `observed` joint counts, the `node` and `collocate` totals and the
+    `total` size of the sample.
+    "pmi" is the pointwise mutual information (log2 of observed over
+    expected); "llr" is Dunning's log-likelihood ratio, made negative where
+    the pair occurs less often than expected.
+    """
+    o11 = np.asarray(observed, dtype=np.float64)
+    r1 = np.broadcast_to(np.asarray(node, dtype=np.float64), o11.shape)
+    c1 = np.broadcast_to(np.asarray(collocate, dtype=np.float64), o11.shape)
+    n = float(total)
+    e11 = r1 * c1 / n
+    if measure == "pmi":
+        return np.log2(o11 / e11)
+    if measure != "llr":
+        raise ValueError(f"Unknown association measure: {measure}")
+    # windows may overlap, so keep the other cells of the table non-negative
+    cells = [
+        (o11, e11),
+        (np.maximum(r1 - o11, 0), r1 * (n - c1) / n),
+        (np.maximum(c1 - o11, 0), (n - r1) * c1 / n),
+        (np.maximum(n - r1 - c1 + o11, 0), (n - r1) * (n - c1) / n),
+    ]
+    g2 = np.zeros_like(o11)
+    for o, e in cells:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            g2 += np.where(o > 0, o * np.log(o / e), 0.0)
+    return np.sign(o11 - e11) * 2 * g2
@@ -1,81 +1,286 @@
-from typing import Dict, List, Any
+import re
+import time
+from array import array
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Any, Optional
 
-import requests
-from bs4 import BeautifulSoup
+import oracc_profile
+from oracc_fetch import Fetcher, default_fetcher
+from oracc_reader import FileReader
 
 
-def grab_translation(project: str, pnum: str):
-    translation: List[str] = []
-    r = requests.get(f"http://oracc.org/{project}/{pnum}")
-    soup = BeautifulSoup(r.text)
-    for line in soup.find_all("p", class_="tr"):
-        s = BeautifulSoup(str(line))
-        # seems like SAA10 at least is in Windows-1252 (gross!)
-        # https://www.i18nqa.com/debug/utf8-debug.html
-        # TODO: add line detection
-        # you just need to s.find(class_='xtr-label').get_text()
-        s = bytes(s.get_text(), encoding="cp1252").decode()
-        translation.append(s)
-    return translation
+def grab_translation(project: str, pnum: str, fetcher: Optional[Fetcher] = None):
+    # pooled, cached and retried; see oracc_fetch for fetching many at once
+    fetcher = fetcher if fetcher is not None else default_fetcher()
+    return fetcher.translation(project, pnum)
+
+
+# the CDL keys collected by extract_layers
+LAYERS = ("norm", "frag", "form", "sense")
+# corpus layer names and the CDL keys they are read from
+LAYER_KEYS = {"norm": "norm", "translit": "frag", "form": "form", "sense": "sense"}
+
+
+class Vocabulary:
+    """
+    This class interns token strings: each distinct token is kept once and
+    texts store arrays of integer ids into it. One vocabulary (VOCABULARY) is
+    shared by every corpus in a process unless another one is handed in, so
+    ids can be compared across corpora.
+    """
+
+    __slots__ = ("ids", "tokens")
+
+    def __init__(self, tokens: Iterable[str] = ()):
+        self.ids: Dict[str, int] = {}
+        self.tokens: List[str] = []
+        for token in tokens:
+            self.id(token)
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def id(self, token: Any) -> int:
+        if not isinstance(token, str):
+            token = f"{token}"
+        i = self.ids.get(token)
+        if i is None:
+            i = self.ids[token] = len(self.tokens)
+            self.tokens.append(token)
+        return i
+
+    def encode(self, tokens: Iterable[Any]) -> array:
+        return array("I", map(self.id, tokens))
+
+    def decode(self, ids: Iterable[int]) -> List[str]:
+        tokens = self.tokens
+        return [tokens[i] for i in ids]
+
+
+VOCABULARY = Vocabulary()
+
+
+class CDLLayers:
+    """
+    This class holds the token layers pulled out of one CDL tree: an array of
+    vocabulary ids per key, the labels of the lines (also as ids) and, per
+    key, the number of tokens that came before each line started.
+    """
+
+    __slots__ = ("vocab", "ids", "labels", "offsets")
+
+    def __init__(self, keys=LAYERS, vocab: Optional[Vocabulary] = None):
+        self.vocab: Vocabulary = vocab if vocab is not None else VOCABULARY
+        self.ids: Dict[str, array] = {key: array("I") for key in keys}
+        self.labels: array = array("I")
+        self.offsets: Dict[str, array] = {key: array("I") for key in keys}
+
+    def tokens(self, key: str, start: int = 0, end: Optional[int] = None) -> List[str]:
+        return self.vocab.decode(self.ids[key][start:end])
+
+    def lines(self, key: str) -> List[str]:
+        # same strings as joining the tokens and splitting on the line markers
+        tokens = self.tokens(key)
+        offsets = self.offsets[key].tolist()
+        if not offsets:
+            return [" ".join(tokens)]
+        head = tokens[: offsets[0]]
+        lines = [" ".join(head) + " " if head else ""]
+        ends = offsets[1:] + [len(tokens)]
+        labels = self.vocab.decode(self.labels)
+        for label, start, end in zip(labels, offsets, ends):
+            lines.append(" ".join([label] + tokens[start:end]) + " ")
+        lines[-1] = lines[-1][:-1]
+        return lines
+
+    def label(self, key: str, i: int) -> str:
+        # the label of the line token i of `key` is on, "" before the first
+        line = bisect_right(self.offsets[key], i) - 1
+        return self.vocab.tokens[self.labels[line]] if line >= 0 else ""
+
+
+def extract_layers(
+    input_json, keys=LAYERS, vocab: Optional[Vocabulary] = None
+) -> CDLLayers:
+    """
+    Walks a CDL tree once, depth first and without recursion, and collects the
+    values of all `keys` and the line boundaries on the way.
+    """
+    profile = oracc_profile.PROFILE
+    if profile is not None:
+        start = time.perf_counter()
+    layers = CDLLayers(keys, vocab)
+    intern = layers.vocab.id
+    ids = layers.ids
+    stack = [iter([(None, input_json)])]
+    while stack:
+        try:
+            k, v = next(stack[-1])
+        except StopIteration:
+            stack.pop()
+            continue
+        if k in ids:
+            ids[k].append(intern(v))
+        elif isinstance(v, dict):
+            if v.get("node") == "d" and v.get("type") == "line-start":
+                layers.labels.append(intern(f"{v.get('label')}"))
+                for key, offsets in layers.offsets.items():
+                    offsets.append(len(ids[key]))
+            stack.append(iter(v.items()))
+        elif isinstance(v, list):
+            stack.append(((None, item) for item in v))
+    if profile is not None:
+        profile.record("extract", time.perf_counter() - start, texts=1)
+    return layers
+
+
+# determinatives ({d}, {m}, {ki}, ...) are signs of their own
+SIGN_SEPARATORS = re.compile(r"(\{[^}]*\})|[-.]")
+# brackets, half brackets and flags around readings
+SIGN_MARKS = re.compile(r"[\[\]⸢⸣˹˺<>«»#?!*]")
+
+
+def split_signs(frag: str, marks: re.Pattern = SIGN_MARKS) -> List[str]:
+    """
+    Splits a transliterated word (a "frag" token, e.g. "{d}AMAR.UTU" or
+    "[šar]-ru") into its signs, with the brackets and flags around them
+    dropped; a break ("[...]") is kept as the sign "…".
+    """
+    signs = []
+    for part in SIGN_SEPARATORS.split(frag.replace("...", "…")):
+        if part:
+            sign = marks.sub("", part)
+            if sign:
+                signs.append(sign)
+    return signs
 
 
 def grab_all(input_json, type: str, split_lines: bool = False) -> List[str]:
-    def recursive_walk(json, type):
-        if isinstance(json, dict):
-            if split_lines:
-                if json.get("node") == "d":
-                    if json.get("type") == "line-start":
-                        yield f"**{json.get('label')}"
-            for k, v in json.items():
-                if k == type:
-                    yield v
-                else:
-                    yield from recursive_walk(v, type)
-        elif isinstance(json, list):
-            for item in json:
-                yield from recursive_walk(item, type)
-
-    output: list = [token for token in recursive_walk(input_json, type)]
+    layers = extract_layers(input_json, (type,), Vocabulary())
     if split_lines:
-        output = " ".join(output).split("**")
-    return output
+        return layers.lines(type)
+    return layers.tokens(type)
 
 
 class ORACC_Text:
     """
     This class represent a text from an ORACC corpus.
+
+    A text can also be created lazily from its `pnum` and the `path` of its
+    CDL file, without `json`; the file is then only read the first time
+    `json` is accessed (e.g. through `get_norm` or `get_translit`). `path`
+    is then read from `source` (see oracc_reader) if one is given.
+
+    Tokens are kept as id arrays into `vocab` (by default the shared
+    VOCABULARY); once they are extracted the raw json can be let go of with
+    drop_json, or, with `keep_json=False`, is let go of right away.
     """
 
-    def __init__(self, json: dict, metadata: dict = {}):
-        self.pnum: str = json["textid"]
-        self.json: Dict[str, Any] = json
+    __slots__ = (
+        "pnum",
+        "path",
+        "source",
+        "_json",
+        "metadata",
+        "ancient_author",
+        "layers",
+        "vocab",
+        "keep_json",
+    )
+
+    def __init__(
+        self,
+        json: Optional[dict] = None,
+        metadata: dict = {},
+        pnum: str = "",
+        path: str = "",
+        source=None,
+        vocab: Optional[Vocabulary] = None,
+        keep_json: bool = True,
+    ):
+        self.pnum: str = json["textid"] if json is not None else pnum
+        self.path: str = path
+        self.source = source
+        self._json: Optional[Dict[str, Any]] = json
         self.metadata: Dict[str, Any] = metadata
         self.ancient_author: str = self.metadata["ancient_author"]
-        self.norm: List[str] = []
-        self.translit: List[str] = []
+        self.layers: Optional[CDLLayers] = None
+        self.vocab: Vocabulary = vocab if vocab is not None else VOCABULARY
+        self.keep_json: bool = keep_json
+
+    @property
+    def json(self) -> Dict[str, Any]:
+        if self._json is None:
+            if self.source is not None:
+                self._json = self.source.read(self.path)
+            else:
+                self._json = FileReader(self.path).data
+        return self._json
+
+    @property
+    def loaded(self) -> bool:
+        return self._json is not None
+
+    def unload(self) -> None:
+        """
+        Drops the json and the extracted layers again, if the text can be read
+        back from its `path`.
+        """
+        if self.path:
+            self._json = None
+            self.layers = None
+
+    def drop_json(self) -> None:
+        """
+        Extracts the layers (if that has not happened yet) and drops the raw
+        json, keeping only the token arrays.
+        """
+        self.get_layers()
+        self._json = None
+
+    def get_layers(self) -> CDLLayers:
+        # extracted once, then every getter and printer reads from here; the
+        # layers may also have been filled in from a corpus cache
+        if self.layers is None:
+            self.layers = extract_layers(self.json, vocab=self.vocab)
+            if not self.keep_json:
+                self._json = None
+        return self.layers
 
     def get_norm(self) -> List[str]:
-        # I'm not sure of these if/else statements actually do anything with
-        # such small texts.
-        if len(self.norm) > 0:
-            return self.norm
-        else:
-            self.norm = grab_all(self.json, type="norm")
-            return self.norm
+        return self.get_layers().tokens("norm")
+
+    def get_norm_lines(self) -> List[str]:
+        return self.get_layers().lines("norm")
 
     def pprint_norm(self) -> None:
-        for line in grab_all(self.json, "norm", split_lines=True):
+        for line in self.get_norm_lines():
             print(line)
 
     def get_translit(self) -> List[str]:
-        if len(self.translit) > 0:
-            return self.translit
-        else:
-            self.translit = grab_all(self.json, type="frag")
-            return self.translit
+        return self.get_layers().tokens("frag")
+
+    def get_translit_lines(self) -> List[str]:
+        return self.get_layers().lines("frag")
 
     def pprint_translit(self) -> None:
-        for line in grab_all(self.json, "frag", split_lines=True):
+        for line in self.get_translit_lines():
             print(line)
 
-    # TODO: add 'sense'
+    def get_form(self) -> List[str]:
+        return self.get_layers().tokens("form")
+
+    def get_sense(self) -> List[str]:
+        return self.get_layers().tokens("sense")
+
+    def get_ids(self, layer: str = "norm") -> array:
+        if layer not in LAYER_KEYS:
+            raise ValueError(f"Unknown layer: {layer}")
+        return self.get_layers().ids[LAYER_KEYS[layer]]
+
+    def get_tokens(
+        self, layer: str = "norm", start: int = 0, end: Optional[int] = None
+    ) -> List[str]:
+        if layer not in LAYER_KEYS:
+            raise ValueError(f"Unknown layer: {layer}")
+        return self.get_layers().tokens(LAYER_KEYS[layer], start, end)
@@ -0,0 +1,97 @@
+import json
+
+import pytest
+
+from oracc_corpus import guess_filenames
+
+
+def make_text(pnum, words):
+    cdl = [{"node": "d", "type": "line-start", "label": "o 1"}]
+    for word in words:
+        cdl.append(
+            {
+                "node": "l",
+                "frag": word,
+                "f": {"norm": word, "form": word, "sense": word},
+            }
+        )
+    return {"type": "cdl", "textid": pnum, "cdl": [{"node": "c", "cdl": cdl}]}
+
+
+def write_project(directory, texts, changed=None):
+    catalogue = {pnum: {"id_text": pnum, "ancient_author": "Balasî"} for pnum in texts}
+    members = {pnum: f"corpusjson/{pnum}.json" for pnum in texts}
+    files = {
+        "catalogue.json": {"type": "catalogue", "members": catalogue},
+        "metadata.json": {"config": {"name": "SAA 10", "pathname": "saao/saa10"}},
+        "corpus.json": {"type": "corpus", "members": members},
+    }
+    (directory / "corpusjson").mkdir(parents=True, exist_ok=True)
+    for name, data in files.items():
+        (directory / name).write_text(json.dumps(data), encoding="utf8")
+    # only the texts in `changed` (by default all) are written
+    for pnum in changed if changed is not None else texts:
+        text = json.dumps(make_text(pnum, texts[pnum]), ensure_ascii=False)
+        (directory / members[pnum]).write_text(text, encoding="utf8")
+
+
+@pytest.fixture
+def texts():
+    return {
+        "P000001": ["ana", "šarri", "bēlīya"],
+        "P000002": ["urdaka", "šarri", "šulmu"],
+        "P000003": ["ana", "bēlīya", "šulmu"],
+    }
+
+
+def test_refresh(tmp_path, texts):
+    write_project(tmp_path, texts)
+    corpus = guess_filenames(str(tmp_path))
+    corpus.get_index()
+    corpus.get_sign_index()
+    view = corpus.select(author="Balasî")
+    assert corpus.kwic("šarri", 1) == [
+        ["ana", "šarri", "bēlīya"],
+        ["urdaka", "šarri", "šulmu"],
+    ]
+
+    texts["P000001"] = ["urdaka", "šulmu", "adanniš", "ana", "šarri", "bēlīya"]
+    texts["P000004"] = ["šarri", "lū", "šulmu"]
+    del texts["P000003"]
+    write_project(tmp_path, texts, ["P000001", "P000004"])
+    (tmp_path / "corpusjson" / "P000003.json").unlink()
+    changes = corpus.refresh()
+
+    assert changes == {
+        "added": ["P000004"],
+        "changed": ["P000001"],
+        "removed": ["P000003"],
+    }
+    assert list(corpus.texts) == ["P000001", "P000002", "P000004"]
+    assert corpus.kwic("šarri", 1) == [
+        ["ana", "šarri", "bēlīya"],
+        ["urdaka", "šarri", "šulmu"],
+        ["šarri", "lū"],
+    ]
+    assert corpus.kwic("bēlīya") == [["ana", "šarri", "bēlīya"]]
+    assert [pnum for pnum, _, _ in corpus.sign_search("šarri")] == [
+        "P000001",
+        "P000002",
+        "P000004",
+    ]
+    assert corpus.lookup("ancient_author", "Balasî") == list(corpus.texts)
+
+    # the view keeps its texts, but only finds hits in the unchanged ones
+    assert list(view.texts) == ["P000001", "P000002", "P000003"]
+    assert view.kwic("šarri", 1) == [["urdaka", "šarri", "šulmu"]]
+    assert view.kwic("šulmu") == [["urdaka", "šarri", "šulmu"]]
+    assert [pnum for pnum, _, _ in view.sign_search("šarri")] == ["P000002"]
+    with pytest.raises(TypeError):
+        view.refresh()
+
+
+def test_refresh_unchanged(tmp_path, texts):
+    write_project(tmp_path, texts)
+    corpus = guess_filenames(str(tmp_path))
+    assert corpus.refresh() == {"added": [], "changed": [], "removed": []}
+    assert list(corpus.texts) == list(texts)
@@ -0,0 +1,112 @@
+import json
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from oracc_corpus import ORACC_Corpus
+from oracc_fetch import Fetcher, parse_translation
+
+PAGES = {
+    "/saao/saa10/P000001": '<p class="tr">To the king, my lord: your servant Balasî.</p>',
+    "/saao/saa10/P000002": (
+        '<p class="tr">Good health to Aššur-etel-ilāni-mukīnni!</p>'
+        '<p class="tr">Nabû and Marduk bless the king.</p>'
+    ),
+}
+
+
+class Handler(BaseHTTPRequestHandler):
+    # the stand-in for oracc.org: fixed pages, 404 for anything else
+    hits: Counter = Counter()
+
+    def do_GET(self):
+        Handler.hits[self.path] += 1
+        page = PAGES.get(self.path)
+        if page is None:
+            self.send_error(404)
+            return
+        body = f"<html><body>{page}</body></html>".encode("utf8")
+        # like ORACC, no charset in the headers
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    Handler.hits.clear()
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_get(server, tmp_path):
+    fetcher = Fetcher(cache_dir=tmp_path / "cache", retries=0, base_url=server)
+    url = f"{server}/saao/saa10/P000001"
+    page = fetcher.get(url)
+    assert "Balasî".encode("utf8") in page
+    # the second time comes from the cache, without a request
+    assert fetcher.get(url) == page
+    assert Handler.hits["/saao/saa10/P000001"] == 1
+
+
+def test_get_many(server):
+    fetcher = Fetcher(retries=0, base_url=server)
+    urls = [f"{server}/saao/saa10/P000001", f"{server}/saao/saa10/P999999"]
+    pages = fetcher.get_many(urls)
+    assert list(pages) == urls[:1]
+    assert list(fetcher.errors) == urls[1:]
+    assert fetcher.errors[urls[1]].response.status_code == 404
+
+
+def test_parse_translation():
+    html = f"<html><body>{PAGES['/saao/saa10/P000002']}</body></html>".encode("utf8")
+    assert parse_translation(html) == [
+        "Good health to Aššur-etel-ilāni-mukīnni!",
+        "Nabû and Marduk bless the king.",
+    ]
+
+
+def make_project(directory, pnums):
+    catalogue = {pnum: {"id_text": pnum, "ancient_author": "Balasî"} for pnum in pnums}
+    members = {pnum: f"corpusjson/{pnum}.json" for pnum in pnums}
+    files = {
+        "catalogue.json": {"type": "catalogue", "members": catalogue},
+        "metadata.json": {"config": {"name": "SAA 10", "pathname": "saao/saa10"}},
+        "corpus.json": {"type": "corpus", "members": members},
+    }
+    (directory / "corpusjson").mkdir(parents=True)
+    for name, data in files.items():
+        (directory / name).write_text(json.dumps(data), encoding="utf8")
+    for pnum in pnums:
+        text = {"type": "cdl", "textid": pnum, "cdl": []}
+        (directory / members[pnum]).write_text(json.dumps(text), encoding="utf8")
+
+
+def test_grab_translations(server, tmp_path):
+    make_project(tmp_path, ["P000001", "P000002", "P000003"])
+    corpus = ORACC_Corpus(
+        str(tmp_path / "catalogue.json"),
+        str(tmp_path / "metadata.json"),
+        str(tmp_path / "corpus.json"),
+    )
+    fetcher = Fetcher(retries=0, base_url=server)
+    translations = corpus.grab_translations(fetcher)
+    assert translations == {
+        "P000001": ["To the king, my lord: your servant Balasî."],
+        "P000002": [
+            "Good health to Aššur-etel-ilāni-mukīnni!",
+            "Nabû and Marduk bless the king.",
+        ],
+    }
+    assert list(fetcher.errors) == [f"{server}/saao/saa10/P000003"]